@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+#
+# Measures refresh latency with and without batched API queries
+# against the local hub stand-in.
+# Usage: python3 -m devtools.batch_bench --latency 150 --rounds 20
+#
+
+import os
+import time
+import argparse
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from firefly.common import *
+from .stub_hub import StubHub, serve
+
+
+def refresh_burst(done):
+    # Mimics a view refresh: several small reads fired back to back
+    pending = [4]
+
+    def on_response(response):
+        pending[0] -= 1
+        if not pending[0]:
+            done()
+
+    api.get(on_response, id_view=1, result=["id", "mtime"], limit=100)
+    api.get(on_response, objects=list(range(1, 50)))
+    api.settings(on_response)
+    api.get(on_response, objects=list(range(50, 100)))
+
+
+def run(rounds, batch):
+    config["api_batch"] = batch
+    api.batch_supported = True
+    durations = []
+    loop = QEventLoop()
+    for i in range(rounds):
+        start_time = time.time()
+        refresh_burst(loop.quit)
+        loop.exec_()
+        durations.append(time.time() - start_time)
+    return durations
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=int, default=150, help="Simulated round trip time in ms")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--port", type=int, default=18080)
+    args = parser.parse_args()
+
+    app = QCoreApplication([])
+    hub = StubHub(latency=args.latency)
+    server = serve(hub, port=args.port)
+    config["hub"] = "http://127.0.0.1:{}".format(args.port)
+    config["session_id"] = "stub"
+    config["api_features"] = ["batch"]
+
+    for batch in [False, True]:
+        hub.request_count = 0
+        durations = run(args.rounds, batch)
+        print("{:<10} avg {:.03f}s  min {:.03f}s  max {:.03f}s  HTTP requests: {}".format(
+                "batched" if batch else "single",
+                sum(durations) / len(durations),
+                min(durations),
+                max(durations),
+                hub.request_count
+            ))
+    server.shutdown()
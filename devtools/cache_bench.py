@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+#
+# Measures memory used by cached assets, with and without shared
+# metadata keys.
+# Usage: python3 -m devtools.cache_bench --assets 10000 --keys 40
+#
+
+import json
+import argparse
+import tracemalloc
+
+from nx import *
+from nx.objects import compact_meta
+from .stub_hub import StubHub
+
+
+def synthetic_rows(count, keys):
+    hub = StubHub(assets=count)
+    rows = []
+    for id_asset in range(1, count + 1):
+        meta = hub.asset_meta(id_asset)
+        # Folder specific metadata
+        for i in range(keys):
+            meta["custom/field_{:02d}".format(i)] = "value {}".format(i % 7) if i % 2 else id_asset * i
+        rows.append(json.dumps(meta))
+    return rows
+
+
+def measure(rows, compact):
+    # Each row is decoded separately, as when loaded from the cache database
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = tracemalloc.get_traced_memory()[0]
+    if compact:
+        assets = [Asset(meta=compact_meta(json.loads(row))) for row in rows]
+    else:
+        assets = [Asset(meta=json.loads(row)) for row in rows]
+    used = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    del(assets)
+    return used
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--assets", type=int, default=10000)
+    parser.add_argument("--keys", type=int, default=40, help="Additional metadata keys per asset")
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.assets, args.keys)
+    json_size = sum(len(row) for row in rows)
+    print("{} assets, {:.0f} B of JSON per asset".format(args.assets, json_size / args.assets))
+    for compact in [False, True]:
+        used = measure(rows, compact)
+        print("{:<10} {:>10.0f} B per asset  ({:.1f} MB total)".format(
+                "compact" if compact else "plain",
+                used / args.assets,
+                used / 1024 / 1024
+            ))
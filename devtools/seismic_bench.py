@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+#
+# Pushes synthetic seismic traffic through the client at fixed rates and
+# reports handling latency, queue depth and GUI event loop lag.
+# Messages travel the real path: stub hub websocket, SeismicListener,
+# FireflyMainWindow.on_seismic_messages and module seismic handlers.
+# Usage: python3 -m devtools.seismic_bench --rates 100 1000 5000 --duration 10
+#
+
+import os
+import time
+import random
+import argparse
+import threading
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from firefly.common import *
+from firefly.application import FireflyApplication
+from firefly.seismic import seismic_stats
+from .stub_hub import StubHub, serve
+
+# Share of each method in the generated traffic
+MIX = [
+        ["playout_status", 40],
+        ["job_progress", 40],
+        ["objects_changed", 10],
+        ["rundown_changed", 10],
+    ]
+
+SAMPLE_INTERVAL = 100   # ms between queue depth samples
+TICK_INTERVAL = 20      # ms between event loop lag probes
+
+
+def percentile(values, p):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def synthetic_message(method, hub):
+    if method == "playout_status":
+        id_channel = random.choice([1, 2])
+        return {
+                "id_channel" : id_channel,
+                "current_item" : False,
+                "cued_item" : False,
+                "current_title" : "(no clip)",
+                "cued_title" : "(no clip)",
+                "position" : random.random() * 60,
+                "duration" : 60,
+                "request_time" : time.time(),
+                "paused" : False,
+                "fps" : 25.0,
+            }
+    if method == "job_progress":
+        id_job = random.randint(1, 50)
+        return {
+                "id" : id_job,
+                "id_asset" : 1 + id_job * 7 % hub.asset_count,
+                "id_action" : 1,
+                "status" : 1,
+                "progress" : random.random() * 100,
+                "message" : "In progress",
+            }
+    if method == "objects_changed":
+        return {
+                "object_type" : "asset",
+                "objects" : random.sample(range(1, hub.asset_count + 1), 3),
+            }
+    return {"id_channel" : 1, "bins" : [random.randint(1, 100)]}
+
+
+class Generator(threading.Thread):
+    def __init__(self, hub, rate, duration):
+        super(Generator, self).__init__(daemon=True)
+        self.hub = hub
+        self.rate = rate
+        self.duration = duration
+        self.sent = 0
+        self.methods = [method for method, weight in MIX for i in range(weight)]
+
+    def run(self):
+        start_time = time.time()
+        while True:
+            elapsed = time.time() - start_time
+            if elapsed > self.duration:
+                break
+            for i in range(int(elapsed * self.rate) - self.sent):
+                method = random.choice(self.methods)
+                self.hub.broadcast(method, synthetic_message(method, self.hub))
+                self.sent += 1
+            time.sleep(.002)
+
+
+class Probe():
+    """Collects latency, queue depth and event loop lag samples"""
+    def __init__(self, wnd):
+        self.wnd = wnd
+        self.latencies = []
+        self.depths = []
+        self.lags = []
+        self.start_time = time.time()
+        self.last_tick = time.time()
+
+        handler = wnd.seismic_handler
+        def timed_handler(message):
+            handler(message)
+            self.latencies.append(time.time() - message.timestamp)
+        wnd.seismic_handler = timed_handler
+
+        self.sample_timer = QTimer()
+        self.sample_timer.timeout.connect(self.on_sample)
+        self.tick_timer = QTimer()
+        self.tick_timer.timeout.connect(self.on_tick)
+
+    @property
+    def depth(self):
+        return len(self.wnd.listener.queue) + len(self.wnd.seismic_pending)
+
+    def start(self):
+        self.latencies = []
+        self.depths = []
+        self.lags = []
+        self.start_time = self.last_tick = time.time()
+        self.sample_timer.start(SAMPLE_INTERVAL)
+        self.tick_timer.start(TICK_INTERVAL)
+
+    def stop(self):
+        self.sample_timer.stop()
+        self.tick_timer.stop()
+
+    def on_sample(self):
+        self.depths.append([time.time() - self.start_time, self.depth])
+
+    def on_tick(self):
+        now = time.time()
+        self.lags.append(max(0, now - self.last_tick - TICK_INTERVAL / 1000.0))
+        self.last_tick = now
+
+
+def wait(seconds, condition=None):
+    loop = QEventLoop()
+    deadline = time.time() + seconds
+    def check():
+        if time.time() > deadline or (condition and condition()):
+            loop.quit()
+        else:
+            QTimer.singleShot(50, check)
+    QTimer.singleShot(50, check)
+    loop.exec_()
+
+
+def run(hub, probe, rate, duration):
+    handled = seismic_stats.handled
+    coalesced = seismic_stats.coalesced
+    dropped = probe.wnd.listener.dropped
+    probe.start()
+    generator = Generator(hub, rate, duration)
+    generator.start()
+    wait(duration + 1, lambda: not generator.is_alive())
+    # Let the client drain its queue
+    wait(30, lambda: not probe.depth)
+    probe.stop()
+
+    print("{} msg/s: {} sent, {} handled, {} coalesced, {} dropped".format(
+            rate,
+            generator.sent,
+            seismic_stats.handled - handled,
+            seismic_stats.coalesced - coalesced,
+            probe.wnd.listener.dropped - dropped
+        ))
+    print("  latency    p50 {:.03f}s  p95 {:.03f}s  p99 {:.03f}s  max {:.03f}s".format(
+            *[percentile(probe.latencies, p) for p in [50, 95, 99, 100]]
+        ))
+    print("  loop lag   p50 {:.03f}s  p95 {:.03f}s  max {:.03f}s".format(
+            *[percentile(probe.lags, p) for p in [50, 95, 100]]
+        ))
+    timeline = {}
+    for t, depth in probe.depths:
+        timeline[int(t)] = max(timeline.get(int(t), 0), depth)
+    print("  queue depth per second (max): {}".format(
+            " ".join([str(timeline[t]) for t in sorted(timeline)])
+        ))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rates", type=int, nargs="+", default=[100, 1000, 5000], help="Messages per second")
+    parser.add_argument("--duration", type=int, default=10, help="Seconds of traffic per rate")
+    parser.add_argument("--module", choices=["rundown", "jobs", "detail"], default="rundown",
+            help="Module displayed during the test")
+    parser.add_argument("--port", type=int, default=18080)
+    args = parser.parse_args()
+
+    hub = StubHub()
+    server = serve(hub, port=args.port)
+    config["sites"] = [{"site_name" : hub.site_name, "hub" : "http://127.0.0.1:{}".format(args.port)}]
+
+    app = FireflyApplication()
+    wnd = app.main_window
+    module = getattr(wnd, args.module)
+    if module:
+        wnd.main_widget.switch_tab(module)
+
+    wait(10, lambda: hub.clients)
+    if not hub.clients:
+        critical_error("Seismic listener did not connect")
+    probe = Probe(wnd)
+    for rate in args.rates:
+        run(hub, probe, rate, args.duration)
+
+    server.shutdown()
+    app.on_exit()
@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+#
+# Local stand-in for the Nebula hub.
+#
+# Serves the API endpoints used by Firefly and the /ws/<site> seismic
+# websocket with synthetic data, or replays a session recorded by
+# Firefly (record_session option in settings.json).
+#
+# Usage:
+#   python3 -m devtools.stub_hub --port 8080 --latency 150
+#   python3 -m devtools.stub_hub --replay session.jsonl --speed 10
+#
+
+import re
+import gzip
+import json
+import time
+import base64
+import hashlib
+import argparse
+import threading
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+__all__ = ["StubHub", "serve"]
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC11B85"
+
+# Meta classes as defined by nebulacore
+STRING, TEXT, INTEGER, NUMERIC, BOOLEAN, DATETIME, TIMECODE = range(7)
+
+SECS_PER_DAY = 24 * 3600
+EVENT_LENGTH = 2 * 3600
+ITEMS_PER_EVENT = 4
+
+
+def canonical_params(params):
+    return json.dumps(
+            {k : v for k, v in params.items() if k not in ["session_id", "initiator"]},
+            sort_keys=True,
+            default=str
+        )
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StubHub(object):
+    def __init__(self, latency=0, batch=True, compress=True, assets=10000, site_name="stub"):
+        self.latency = latency
+        self.batch = batch
+        self.compress = compress
+        self.asset_count = assets
+        self.site_name = site_name
+        self.request_count = 0
+        self.lock = threading.Lock()
+        self.clients = []
+        self.send_locks = {}  # client: lock serializing frames sent to it
+        self.recorded = {}
+        self.recorded_seismic = []
+        self.mtimes = {}
+        self.methods = {
+                "get" : self.api_get,
+                "settings" : self.api_settings,
+                "rundown" : self.api_rundown,
+                "schedule" : self.api_schedule,
+                "jobs" : self.api_jobs,
+                "order" : self.api_order,
+                "set" : self.api_set,
+                "delete" : self.api_ok,
+                "playout" : self.api_playout,
+                "actions" : self.api_actions,
+                "send" : self.api_ok,
+                "solve" : self.api_ok,
+            }
+
+    #
+    # Synthetic data
+    #
+
+    def asset_meta(self, id_asset):
+        return {
+                "id" : id_asset,
+                "object_type" : "asset",
+                "id_folder" : 1 + id_asset % 4,
+                "title" : "Asset {}".format(id_asset),
+                "status" : 1,
+                "duration" : 60 + id_asset % 3600,
+                "mtime" : self.mtimes.get(id_asset, 1500000000 + id_asset),
+            }
+
+    def event_meta(self, id_channel, start):
+        id_event = int(start // EVENT_LENGTH) * 10 + id_channel
+        return {
+                "id" : id_event,
+                "object_type" : "event",
+                "id_channel" : id_channel,
+                "id_bin" : id_event,
+                "id_asset" : 1 + id_event % self.asset_count,
+                "title" : "Event {}".format(id_event),
+                "start" : start,
+                "duration" : EVENT_LENGTH,
+                "run_mode" : 0,
+                "is_empty" : False,
+                "mtime" : 1500000000,
+            }
+
+    def events(self, id_channel, start_time, end_time):
+        start = int(start_time // EVENT_LENGTH) * EVENT_LENGTH
+        while start < end_time:
+            yield self.event_meta(id_channel, start)
+            start += EVENT_LENGTH
+
+    def api_get(self, **kwargs):
+        min_mtime = None
+        for cond in kwargs.get("conds", []):
+            match = re.match(r"^mtime\s*>\s*(\d+)$", cond.strip())
+            if match:
+                min_mtime = int(match.group(1))
+        if kwargs.get("object_type", "asset") != "asset":
+            # Stub events never change
+            return {"response" : 200, "data" : [], "count" : 0}
+        if kwargs.get("objects"):
+            ids = [int(id_asset) for id_asset in kwargs["objects"]]
+            count = len(ids)
+        elif min_mtime is not None:
+            ids = [
+                    i for i in range(1, self.asset_count + 1)
+                    if self.asset_meta(i)["mtime"] > min_mtime
+                ]
+            count = len(ids)
+        else:
+            offset = kwargs.get("offset", 0)
+            limit = kwargs.get("limit", 1000)
+            ids = list(range(offset + 1, min(offset + limit, self.asset_count) + 1))
+            count = self.asset_count
+        result = kwargs.get("result")
+        if result:
+            data = [[self.asset_meta(i).get(key) for key in result] for i in ids]
+        else:
+            data = [self.asset_meta(i) for i in ids]
+        return {"response" : 200, "data" : data, "count" : count}
+
+    def api_settings(self, **kwargs):
+        data = {
+                "site_name" : self.site_name,
+                "seismic_addr" : "224.168.1.1",
+                "seismic_port" : 42005,
+                "api_features" : [],
+                "storages" : {},
+                "ingest_channels" : {},
+                "services" : {"1" : {"title" : "conv01", "host" : "stub"}},
+                "actions" : {"1" : {"title" : "Transcode"}},
+                "playout_channels" : {
+                    "1" : {"title" : "Channel 1", "day_start" : [6, 0], "send_action" : 1},
+                    "2" : {"title" : "Channel 2", "day_start" : [6, 0], "send_action" : 1},
+                },
+                "folders" : {
+                    str(i) : {
+                        "title" : "Folder {}".format(i),
+                        "color" : 0x505050 + i * 0x101010,
+                        "meta_set" : [["title", {}], ["description", {}]],
+                        "links" : [],
+                    } for i in range(1, 5)
+                },
+                "views" : {
+                    "1" : {"title" : "All", "position" : 1, "columns" : ["title", "duration", "id_folder", "mtime"]},
+                },
+                "meta_types" : {
+                    "title" : {"ns" : "m", "class" : STRING, "fulltext" : 8, "editable" : 1},
+                    "description" : {"ns" : "m", "class" : TEXT, "fulltext" : 4, "editable" : 1},
+                    "duration" : {"ns" : "f", "class" : TIMECODE, "fulltext" : 0, "editable" : 1},
+                    "id_folder" : {"ns" : "a", "class" : INTEGER, "fulltext" : 0, "editable" : 1},
+                    "status" : {"ns" : "a", "class" : INTEGER, "fulltext" : 0, "editable" : 0},
+                    "mtime" : {"ns" : "a", "class" : DATETIME, "fulltext" : 0, "editable" : 0},
+                },
+            }
+        if self.batch:
+            data["api_features"].append("batch")
+        if self.compress:
+            data["api_features"].append("gzip")
+        return {"response" : 200, "data" : data}
+
+    def api_rundown(self, **kwargs):
+        id_channel = int(kwargs.get("id_channel", 1))
+        start_time = kwargs.get("start_time") or time.time()
+        data = []
+        for event in self.events(id_channel, start_time, start_time + SECS_PER_DAY):
+            data.append(event)
+            for i in range(ITEMS_PER_EVENT):
+                id_asset = 1 + (event["id"] * ITEMS_PER_EVENT + i) % self.asset_count
+                data.append({
+                        "id" : event["id"] * 100 + i,
+                        "object_type" : "item",
+                        "id_bin" : event["id_bin"],
+                        "id_asset" : id_asset,
+                        "asset_mtime" : self.asset_meta(id_asset)["mtime"],
+                        "position" : i + 1,
+                        "title" : "Asset {}".format(id_asset),
+                        "run_mode" : 0,
+                    })
+        return {"response" : 200, "data" : data}
+
+    def api_schedule(self, **kwargs):
+        id_channel = int(kwargs.get("id_channel", 1))
+        if kwargs.get("events") or kwargs.get("delete"):
+            self.broadcast("objects_changed", {"object_type" : "event", "objects" : kwargs.get("delete", [])})
+        if not kwargs.get("start_time"):
+            return {"response" : 200, "message" : "Schedule updated"}
+        data = list(self.events(id_channel, kwargs["start_time"], kwargs["end_time"]))
+        return {"response" : 200, "data" : data}
+
+    def api_jobs(self, **kwargs):
+        if kwargs.get("restart") or kwargs.get("abort"):
+            return {"response" : 200, "message" : "OK"}
+        now = time.time()
+        data = [{
+                "id" : i,
+                "id_asset" : 1 + i * 7 % self.asset_count,
+                "id_action" : 1,
+                "id_service" : 1,
+                "status" : 1 if i < 3 else 0,
+                "progress" : (now * 3 + i * 10) % 100,
+                "message" : "In progress",
+                "ctime" : now - 600,
+                "stime" : now - 300,
+                "etime" : 0,
+            } for i in range(1, 51)]
+        return {"response" : 200, "data" : data}
+
+    def api_order(self, **kwargs):
+        self.broadcast("rundown_changed", {"id_channel" : kwargs.get("id_channel"), "bins" : [kwargs.get("id_bin")]})
+        return {"response" : 200, "message" : "Bin order changed"}
+
+    def api_set(self, **kwargs):
+        ids = [int(i) for i in kwargs.get("objects") or []] or [self.asset_count + 1]
+        if kwargs.get("object_type", "asset") == "asset":
+            now = int(time.time())
+            for id_asset in ids:
+                self.mtimes[id_asset] = now
+        self.broadcast("objects_changed", {"object_type" : kwargs.get("object_type", "asset"), "objects" : ids})
+        return {"response" : 200, "data" : ids, "message" : "Saved"}
+
+    def api_playout(self, **kwargs):
+        if kwargs.get("action") == "plugin_list":
+            return {"response" : 200, "data" : []}
+        return {"response" : 200, "message" : "Playout command executed"}
+
+    def api_actions(self, **kwargs):
+        return {"response" : 200, "data" : [[1, "Transcode"]]}
+
+    def api_ok(self, **kwargs):
+        return {"response" : 200, "message" : "OK"}
+
+    def api_batch(self, **kwargs):
+        if not self.batch:
+            return {"response" : 501, "message" : "Batch queries are not supported"}
+        return {
+                "response" : 200,
+                "data" : [self.call(q["method"], q.get("params", {})) for q in kwargs["queries"]]
+            }
+
+    def call(self, method, params):
+        if method == "batch":
+            return self.api_batch(**params)
+        recorded = self.recorded.get((method, canonical_params(params)))
+        if recorded:
+            return recorded
+        handler = self.methods.get(method)
+        if not handler:
+            return {"response" : 501, "message" : "Method {} is not implemented".format(method)}
+        return handler(**params)
+
+    #
+    # Recorded sessions
+    #
+
+    def load_session(self, path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record["type"] == "api":
+                    self.recorded[(record["method"], canonical_params(record["params"]))] = record["response"]
+                elif record["type"] == "seismic":
+                    self.recorded_seismic.append([record["t"], record["packet"]])
+        print("Loaded {} API responses and {} seismic messages".format(
+            len(self.recorded), len(self.recorded_seismic)))
+
+    def replay_seismic(self, speed=1.0, loop=False):
+        while not self.clients:
+            time.sleep(.1)
+        while self.recorded_seismic:
+            start_time = time.time()
+            first = self.recorded_seismic[0][0]
+            for t, packet in self.recorded_seismic:
+                delay = start_time + (t - first) / speed - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                packet = list(packet)
+                packet[0] = time.time()
+                packet[1] = self.site_name
+                self.send_packet(packet)
+            if not loop:
+                break
+
+    #
+    # Seismic
+    #
+
+    def broadcast(self, method, data):
+        self.send_packet([time.time(), self.site_name, "stub", method, data])
+
+    def send_packet(self, packet):
+        frame = ws_frame(json.dumps(packet).encode("utf-8"))
+        with self.lock:
+            clients = [[client, self.send_locks[client]] for client in self.clients]
+        for client, send_lock in clients:
+            try:
+                # Frames sent from several threads must not interleave
+                with send_lock:
+                    client.sendall(frame)
+            except OSError:
+                self.remove_client(client)
+
+    def add_client(self, client):
+        with self.lock:
+            self.send_locks[client] = threading.Lock()
+            self.clients.append(client)
+
+    def remove_client(self, client):
+        with self.lock:
+            if client in self.clients:
+                self.clients.remove(client)
+            self.send_locks.pop(client, None)
+
+    def playout_status_loop(self, interval=1.0):
+        while True:
+            for id_channel in [1, 2]:
+                self.broadcast("playout_status", {
+                        "id_channel" : id_channel,
+                        "current_item" : False,
+                        "cued_item" : False,
+                        "current_title" : "(no clip)",
+                        "cued_title" : "(no clip)",
+                        "position" : 0,
+                        "duration" : 0,
+                        "request_time" : time.time(),
+                        "paused" : False,
+                        "fps" : 25.0,
+                    })
+            time.sleep(interval)
+
+
+def ws_frame(payload):
+    length = len(payload)
+    if length < 126:
+        header = bytes([0x81, length])
+    elif length < 65536:
+        header = bytes([0x81, 126]) + length.to_bytes(2, "big")
+    else:
+        header = bytes([0x81, 127]) + length.to_bytes(8, "big")
+    return header + payload
+
+
+def handler_factory(hub):
+    class StubHubHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def reply(self, result):
+            body = json.dumps(result, ensure_ascii=False).encode("utf-8")
+            etag = '"{}"'.format(hashlib.sha1(body).hexdigest())
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            if hub.compress and "gzip" in self.headers.get("Accept-Encoding", ""):
+                body = gzip.compress(body)
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            key = self.headers.get("Sec-WebSocket-Key")
+            if not self.path.startswith("/ws/") or not key:
+                self.send_error(404)
+                return
+            accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode("ascii")).digest())
+            self.send_response(101, "Switching Protocols")
+            self.send_header("Upgrade", "websocket")
+            self.send_header("Connection", "Upgrade")
+            self.send_header("Sec-WebSocket-Accept", accept.decode("ascii"))
+            self.end_headers()
+            self.wfile.flush()
+            hub.add_client(self.connection)
+            # Keep the connection open until the client leaves
+            try:
+                while self.connection.recv(1024):
+                    pass
+            except OSError:
+                pass
+            hub.remove_client(self.connection)
+            self.close_connection = True
+
+        def do_POST(self):
+            with hub.lock:
+                hub.request_count += 1
+            if hub.latency:
+                time.sleep(hub.latency / 1000.0)
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length)
+            if self.headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            if self.path in ["/ping", "/login", "/logout"]:
+                self.reply({
+                        "response" : 200,
+                        "data" : {"id" : 1, "login" : "stub", "is_admin" : True},
+                        "session_id" : "stub"
+                    })
+                return
+            if not self.path.startswith("/api/"):
+                self.send_error(404)
+                return
+            try:
+                params = json.loads(body.decode("utf-8")) if body else {}
+            except ValueError:
+                self.reply({"response" : 400, "message" : "Malformed request"})
+                return
+            self.reply(hub.call(self.path[5:], params))
+
+    return StubHubHandler
+
+
+def serve(hub, host="127.0.0.1", port=8080):
+    server = ThreadingHTTPServer((host, port), handler_factory(hub))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Nebula hub stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--site", default="stub", help="Site name")
+    parser.add_argument("--latency", type=int, default=0, help="Simulated round trip time in ms")
+    parser.add_argument("--assets", type=int, default=10000, help="Number of synthetic assets")
+    parser.add_argument("--no-batch", action="store_true", help="Do not advertise batch support")
+    parser.add_argument("--no-compress", action="store_true", help="Do not compress responses")
+    parser.add_argument("--replay", help="Session recorded by Firefly")
+    parser.add_argument("--speed", type=float, default=1.0, help="Seismic replay speed-up")
+    parser.add_argument("--loop", action="store_true", help="Replay seismic messages in loop")
+    args = parser.parse_args()
+
+    hub = StubHub(
+            latency=args.latency,
+            batch=not args.no_batch,
+            compress=not args.no_compress,
+            assets=args.assets,
+            site_name=args.site
+        )
+    if args.replay:
+        hub.load_session(args.replay)
+
+    server = serve(hub, args.host, args.port)
+    print("Stub hub listening on http://{}:{}".format(args.host, args.port))
+
+    if args.replay and hub.recorded_seismic:
+        target = hub.replay_seismic
+        kwargs = {"speed" : args.speed, "loop" : args.loop}
+    else:
+        target = hub.playout_status_loop
+        kwargs = {}
+    threading.Thread(target=target, kwargs=kwargs, daemon=True).start()
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
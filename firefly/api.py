@@ -1,27 +1,459 @@
-__all__ = ["api"]
+__all__ = ["api", "NebulaFuture", "CancelToken", "LANE_PLAYOUT", "LANE_NAVIGATION", "LANE_BACKGROUND"]
 
+import gzip
 import json
+import zlib
 import queue
+import random
+import codecs
 import functools
+import collections
 
 from nx import *
 from pyqtbs import *
 from nebulacore import *
 
 from .version import FIREFLY_VERSION
+from .api_metrics import ApiMetrics
+from .recorder import recorder
+from .response_cache import response_cache, is_conditional_query, content_etag
+
+DEFAULT_TIMEOUT = 30
+COMPRESS_THRESHOLD = 4096
+
+# HTTP statuses of gateways between the client and the hub, meaning the
+# hub was not reached. Such failures (as well as network errors without
+# HTTP status) are worth retrying and count towards the circuit breaker.
+TRANSPORT_ERRORS = [502, 503, 504]
+
+RETRY_LIMIT = 4
+RETRY_DELAY = 0.5     # Initial backoff in seconds, doubled on each attempt
+RETRY_MAX_DELAY = 8
+
+BREAKER_THRESHOLD = 5 # Consecutive transport failures opening the circuit
+BREAKER_COOLDOWN = 10 # Seconds before a probe query is let through
+
+LANE_PLAYOUT, LANE_NAVIGATION, LANE_BACKGROUND = range(3)
+
+LANE_NAMES = {
+        LANE_PLAYOUT : "playout",
+        LANE_NAVIGATION : "navigation",
+        LANE_BACKGROUND : "background",
+    }
+
+# Maximum concurrent queries per lane (0 = unlimited).
+# QNetworkAccessManager opens up to six connections per host, so capped
+# lanes always leave free connections for playout commands.
+LANE_LIMITS = {
+        LANE_PLAYOUT : 0,
+        LANE_NAVIGATION : 3,
+        LANE_BACKGROUND : 1,
+    }
+
+LANE_PRIORITIES = {
+        LANE_PLAYOUT : QNetworkRequest.HighPriority,
+        LANE_NAVIGATION : QNetworkRequest.NormalPriority,
+        LANE_BACKGROUND : QNetworkRequest.LowPriority,
+    }
+
+READ_METHODS = ["get", "rundown", "settings", "actions"]
+
+
+def is_read_query(method, kwargs):
+    if method in READ_METHODS:
+        return True
+    if method == "schedule":
+        return not (kwargs.get("events") or kwargs.get("delete"))
+    if method == "jobs":
+        return not (kwargs.get("restart") or kwargs.get("abort"))
+    if method == "playout":
+        return kwargs.get("action") == "plugin_list"
+    return False
+
+
+def query_lane(method, kwargs):
+    if is_read_query(method, kwargs):
+        return LANE_NAVIGATION
+    # Playout commands, writes and authentication
+    return LANE_PLAYOUT
+
+
+def query_key(method, kwargs):
+    return method + ":" + json.dumps(kwargs, sort_keys=True, default=str)
+
+
+class TransportError(NebulaResponse):
+    """Response made up by the client when the hub did not answer"""
+    pass
+
+
+def is_transport_error(response):
+    # Error codes sent by the hub itself in the response body do not count
+    return isinstance(response, TransportError)
+
+
+class CircuitBreaker():
+    """Fails queries fast while the hub is unreachable.
+
+    After BREAKER_THRESHOLD consecutive transport failures the circuit
+    opens. Once BREAKER_COOLDOWN passes, a single query is let through
+    (half-open) while the others still fail fast: its success closes the
+    circuit, its failure reopens it.
+    """
+    def __init__(self):
+        self.failures = 0
+        self.opened_at = 0
+        self.probe_at = 0
+
+    @property
+    def tripped(self):
+        return self.failures >= BREAKER_THRESHOLD
+
+    @property
+    def probing(self):
+        # A probe without a result (e.g. cancelled) expires after the cooldown
+        return self.probe_at and time.time() - self.probe_at < BREAKER_COOLDOWN
+
+    @property
+    def is_open(self):
+        if not self.tripped:
+            return False
+        return self.probing or time.time() - self.opened_at < BREAKER_COOLDOWN
+
+    def allow(self):
+        """Returns True if a query may be sent now"""
+        if self.is_open:
+            return False
+        if self.tripped:
+            logging.debug("Checking whether the hub is reachable again")
+            self.probe_at = time.time()
+        return True
+
+    def failure(self):
+        self.failures += 1
+        self.probe_at = 0
+        if self.failures == BREAKER_THRESHOLD:
+            logging.warning("Hub is unreachable. Pausing queries for {}s".format(BREAKER_COOLDOWN))
+        if self.tripped:
+            self.opened_at = time.time()
+
+    def success(self):
+        if self.tripped:
+            logging.goodnews("Connection to the hub restored")
+        self.failures = 0
+        self.probe_at = 0
+
+
+class ReplyDecoder():
+    """Decompresses and decodes a reply as it arrives.
+
+    Decoding errors do not raise, as feed runs in a Qt slot. They are
+    stored in the error attribute and finish returns None.
+    """
+    def __init__(self):
+        self.inflater = None
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.chunks = []
+        self.head = []      # compressed data received before any output
+        self.raw = False
+        self.wire_size = 0
+        self.size = 0
+        self.initialized = False
+        self.error = None
+
+    def feed(self, query):
+        if not self.initialized:
+            encoding = bytes(query.rawHeader(b"Content-Encoding")).decode("ascii").strip().lower()
+            if encoding in ["gzip", "deflate"]:
+                # Accepts both gzip and zlib wrapped streams
+                self.inflater = zlib.decompressobj(32 + zlib.MAX_WBITS)
+            self.initialized = True
+        data = bytes(query.readAll())
+        self.wire_size += len(data)
+        if self.error:
+            return
+        try:
+            if self.inflater:
+                data = self.inflate(data)
+            self.size += len(data)
+            self.chunks.append(self.text_decoder.decode(data))
+        except (zlib.error, UnicodeDecodeError) as e:
+            self.error = e
+
+    def inflate(self, data):
+        if self.head is None:
+            return self.inflater.decompress(data)
+        self.head.append(data)
+        try:
+            result = self.inflater.decompress(data)
+        except zlib.error:
+            if self.raw:
+                raise
+            # Some servers send raw deflate streams without zlib header
+            self.raw = True
+            self.inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+            result = self.inflater.decompress(b"".join(self.head))
+        if result:
+            self.head = None
+        return result
+
+    def finish(self):
+        if self.error:
+            return None
+        try:
+            if self.inflater:
+                data = self.inflater.flush()
+                self.size += len(data)
+                self.chunks.append(self.text_decoder.decode(data))
+            self.chunks.append(self.text_decoder.decode(b"", final=True))
+        except (zlib.error, UnicodeDecodeError) as e:
+            self.error = e
+            return None
+        return "".join(self.chunks)
+
+
+class CancelToken():
+    def __init__(self):
+        self.cancelled = False
+        self.futures = []
+
+    def cancel(self):
+        if self.cancelled:
+            return
+        self.cancelled = True
+        futures, self.futures = self.futures, []
+        for future in futures:
+            future.release(self)
+
+
+class NebulaFuture(QObject):
+    finished = pyqtSignal(object)
+
+    def __init__(self, method):
+        super(NebulaFuture, self).__init__()
+        self.method = method
+        self.query = None
+        self.response = None
+        self.callbacks = []
+        self.pinned = False
+        self.lane = LANE_NAVIGATION
+        self.params = {}
+        self.decoder = ReplyDecoder()
+        self.start_time = time.time()
+        self.bytes_out = 0
+        self.attempt = 0
+        self.cache_key = None
+        self.metered = False
+        self.timer = None
+        self.timed_out = False
+
+    @property
+    def is_finished(self):
+        return self.response is not None
+
+    def then(self, callback, token=None):
+        if token is None:
+            self.pinned = True
+        elif token.cancelled:
+            return self
+        else:
+            token.futures.append(self)
+        if self.response is not None:
+            callback(self.response)
+        else:
+            self.callbacks.append([callback, token])
+        return self
+
+    def release(self, token):
+        # Drops callbacks of a cancelled token. Once nobody is interested
+        # in the result, the query itself is aborted.
+        self.callbacks = [c for c in self.callbacks if c[1] is not token]
+        if self.pinned or self.is_finished:
+            return
+        if any(not t.cancelled for c, t in self.callbacks):
+            return
+        logging.debug("Cancelling superseded {} query".format(self.method))
+        self.abort(NebulaResponse(499, "Request cancelled"))
+
+    def resolve(self, response):
+        if self.response is not None:
+            return
+        self.response = response
+        callbacks, self.callbacks = self.callbacks, []
+        for callback, token in callbacks:
+            if token and token.cancelled:
+                continue
+            try:
+                callback(response)
+            except Exception:
+                log_traceback()
+        self.finished.emit(response)
+
+    def wait(self, timeout=DEFAULT_TIMEOUT):
+        # Local event loop instead of busy waiting. User input is excluded,
+        # so the operator cannot trigger other actions during a sync call.
+        self.pinned = True
+        if self.response is None:
+            loop = QEventLoop()
+            self.finished.connect(loop.quit)
+            timer = QTimer()
+            timer.setSingleShot(True)
+            timer.timeout.connect(loop.quit)
+            timer.start(int(timeout * 1000))
+            loop.exec_(QEventLoop.ExcludeUserInputEvents)
+            timer.stop()
+            if self.response is None:
+                logging.error("{} query timed out after {}s".format(self.method, timeout))
+                self.abort(TransportError(408, "Request timed out"))
+        return self.response
+
+    def abort(self, response=None):
+        self.resolve(response or NebulaResponse(499, "Request aborted"))
+        if self.query and self.query.isRunning():
+            self.query.abort()
 
 
 class NebulaAPI():
     def __init__(self):
         self.manager = QNetworkAccessManager()
         self.queries = []
+        self.pending = {}
+        self.coalesced_count = 0
+        self.metrics = ApiMetrics()
+        self.batch_queue = []
+        self.batch_scheduled = False
+        self.batch_supported = True
+        self.lane_queues = {lane : collections.deque() for lane in LANE_NAMES}
+        self.lane_active = {lane : 0 for lane in LANE_NAMES}
+        self.lane_peak = {lane : 0 for lane in LANE_NAMES}
+        self.breaker = CircuitBreaker()
+        self.retry_count = 0
+        self.write_queue = None
 
+    @property
+    def timeout(self):
+        return config.get("api_timeout", DEFAULT_TIMEOUT)
+
+    @property
+    def batch_enabled(self):
+        return self.batch_supported \
+            and config.get("api_batch", False) \
+            and "batch" in config.get("api_features", [])
 
     def run(self, method, callback, **kwargs):
+        lane = kwargs.pop("lane", None)
+        token = kwargs.pop("cancel_token", None)
+        if kwargs.pop("durable", False) and self.write_queue:
+            # Writes which must not be lost when the hub is unreachable
+            return self.attach(self.write_queue.submit(method, kwargs), callback, token)
+        if lane is None:
+            lane = query_lane(method, kwargs)
+        key = query_key(method, kwargs) if is_read_query(method, kwargs) else None
+        future = self.pending.get(key) if key else None
+        if future and not future.is_finished:
+            # Identical query is already in flight. Attach to it.
+            self.coalesced_count += 1
+            self.metrics.coalesce(method)
+            logging.debug("Coalescing {} query ({} saved)".format(method, self.coalesced_count))
+            self.promote(future, lane)
+            return self.attach(future, callback, token)
+
         logging.debug("Executing {}{} query".format("" if callback == -1 else "async ", method))
         kwargs["session_id"] = config["session_id"]
         kwargs["initiator"] = CLIENT_ID
 
+        future = NebulaFuture(method)
+        future.lane = lane
+        if key:
+            self.pending[key] = future
+            future.finished.connect(functools.partial(self.forget_pending, key, future))
+        else:
+            # Reads sent before (or during) a write may return data from
+            # before it. Later reads must not attach to them.
+            self.pending.clear()
+            future.finished.connect(self.clear_pending)
+
+        if key and self.batch_enabled and not is_conditional_query(method, kwargs):
+            # Collect read queries issued within one event loop iteration
+            # and send them in a single round trip
+            self.batch_queue.append([future, method, kwargs])
+            if not self.batch_scheduled:
+                self.batch_scheduled = True
+                QTimer.singleShot(0, self.send_batch)
+        else:
+            self.enqueue(future, method, kwargs)
+        return self.attach(future, callback, token)
+
+    #
+    # Priority lanes
+    #
+
+    def enqueue(self, future, method, kwargs):
+        lane = future.lane
+        limit = LANE_LIMITS[lane]
+        if limit and self.lane_active[lane] >= limit:
+            lane_queue = self.lane_queues[lane]
+            lane_queue.append([future, method, kwargs])
+            self.lane_peak[lane] = max(self.lane_peak[lane], len(lane_queue))
+            return
+        self.dispatch(future, method, kwargs)
+
+    def dispatch(self, future, method, kwargs):
+        lane = future.lane
+        self.lane_active[lane] += 1
+        future.finished.connect(functools.partial(self.on_lane_finished, lane))
+        self.send(future, method, kwargs)
+
+    def on_lane_finished(self, lane, *args):
+        self.lane_active[lane] -= 1
+        lane_queue = self.lane_queues[lane]
+        while lane_queue:
+            future, method, kwargs = lane_queue.popleft()
+            if not future.is_finished:
+                self.dispatch(future, method, kwargs)
+                break
+
+    def promote(self, future, lane):
+        if lane >= future.lane:
+            return
+        for entry in self.lane_queues[future.lane]:
+            if entry[0] is future:
+                self.lane_queues[future.lane].remove(entry)
+                future.lane = lane
+                self.enqueue(*entry)
+                return
+        future.lane = lane
+
+    def prioritize(self, future):
+        """Moves a query to the lane it would use by default"""
+        if not future.is_finished:
+            self.promote(future, query_lane(future.method, future.params))
+
+    def lane_stats(self):
+        return {
+                LANE_NAMES[lane] : {
+                    "active" : self.lane_active[lane],
+                    "queued" : len([entry for entry in self.lane_queues[lane] if not entry[0].is_finished]),
+                    "peak_queued" : self.lane_peak[lane],
+                    "limit" : LANE_LIMITS[lane],
+                } for lane in LANE_NAMES
+            }
+
+    def throttled(self, future, method, kwargs):
+        """Whether the circuit breaker may fail the query fast.
+
+        Only retryable reads are throttled. Playout commands and writes
+        are always sent, so the operator never gets a local error for a
+        Take while the hub may be reachable again.
+        """
+        if future.lane == LANE_PLAYOUT:
+            return False
+        return method == "batch" or is_read_query(method, kwargs)
+
+    def send(self, future, method, kwargs):
+        if self.throttled(future, method, kwargs) and not self.breaker.allow():
+            future.resolve(TransportError(503, "Hub is unreachable"))
+            return
         if method in ["ping", "login", "logout"]:
             method = "/" + method
             mime = QVariant("application/x-www-form-urlencoded")
@@ -31,8 +463,8 @@ class NebulaAPI():
             data = post_data.toString(QUrl.FullyEncoded).encode("ascii")
         else:
             method = "/api/" + method
-            mime = QVariant("application/json")
-            data = json.dumps(kwargs).encode("ascii")
+            mime = QVariant("application/json; charset=utf-8")
+            data = json.dumps(kwargs, ensure_ascii=False).encode("utf-8")
 
         request = QNetworkRequest(QUrl(config["hub"] +  method))
         request.setHeader(
@@ -43,45 +475,194 @@ class NebulaAPI():
                 QNetworkRequest.UserAgentHeader,
                 QVariant("nebula-firefly/{}".format(FIREFLY_VERSION))
             )
+        request.setPriority(LANE_PRIORITIES[future.lane])
+        # Setting Accept-Encoding explicitly disables Qt's own buffered
+        # decompression. Replies are inflated as they arrive (ReplyDecoder).
+        request.setRawHeader(b"Accept-Encoding", b"gzip, deflate")
+        if is_conditional_query(future.method, kwargs):
+            future.cache_key = response_cache.key(future.method, kwargs)
+            etag = response_cache.etag(future.cache_key)
+            if etag:
+                request.setRawHeader(b"If-None-Match", etag.encode("ascii"))
+        if len(data) > COMPRESS_THRESHOLD and "gzip" in config.get("api_features", []):
+            data = gzip.compress(data)
+            request.setRawHeader(b"Content-Encoding", b"gzip")
 
+        future.bytes_out = len(data)
+        future.params = kwargs
         try:
             query = self.manager.post(request, data)
-            if callback != -1:
-                query.finished.connect(functools.partial(self.handler, query, callback))
+            query.readyRead.connect(functools.partial(future.decoder.feed, query))
+            query.finished.connect(functools.partial(self.handler, query, future))
             self.queries.append(query)
+            future.query = query
+            self.meter(future)
+            # Abort replies that stall, so they do not hold lane slots until
+            # the TCP timeout. Restarted whenever data arrive.
+            future.timed_out = False
+            future.timer = QTimer()
+            future.timer.setSingleShot(True)
+            future.timer.timeout.connect(functools.partial(self.on_transfer_timeout, query, future))
+            query.readyRead.connect(future.timer.start)
+            future.timer.start(int(self.timeout * 1000))
         except Exception:
             log_traceback()
-            if callback:
-                r = NebulaResponse(400, "Unable to send request")
-                if callback == -1:
-                    return r
-                else:
-                    callback(r)
+            future.resolve(NebulaResponse(400, "Unable to send request"))
+
+    def meter(self, future):
+        """Starts measuring a query when it is sent for the first time.
+
+        Retries and batch fallbacks are measured as part of the original
+        query, so the latency includes backoff delays.
+        """
+        if future.metered:
+            return
+        future.metered = True
+        future.start_time = time.time()
+        self.metrics.begin(future)
+        future.finished.connect(functools.partial(self.metrics.end, future))
+
+    def send_batch(self):
+        self.batch_scheduled = False
+        batch, self.batch_queue = self.batch_queue, []
+        if len(batch) < 2 or not self.batch_enabled:
+            for future, method, kwargs in batch:
+                self.enqueue(future, method, kwargs)
+            return
+        logging.debug("Executing {} queries in one batch".format(len(batch)))
+        for future, method, kwargs in batch:
+            future.bytes_out = len(json.dumps(kwargs, default=str))
+            self.meter(future)
+        batch_future = NebulaFuture("batch")
+        batch_future.lane = min(future.lane for future, method, kwargs in batch)
+        self.enqueue(batch_future, "batch", {
+                "session_id" : config["session_id"],
+                "initiator" : CLIENT_ID,
+                "queries" : [{"method" : method, "params" : kwargs} for future, method, kwargs in batch]
+            })
+        batch_future.then(functools.partial(self.on_batch_response, batch))
+
+    def on_batch_response(self, batch, response):
+        if response.response in [404, 405, 501] or (response and len(response.data or []) != len(batch)):
+            logging.warning("Batch queries are not supported by the server. Falling back to single queries")
+            self.batch_supported = False
+            for future, method, kwargs in batch:
+                self.enqueue(future, method, kwargs)
             return
+        for i, (future, method, kwargs) in enumerate(batch):
+            if response:
+                if recorder.active:
+                    recorder.record_api(method, kwargs, response.data[i], time.time() - future.start_time)
+                future.resolve(NebulaResponse(**response.data[i]))
+            else:
+                future.resolve(type(response)(response.response, response.message))
 
+    def attach(self, future, callback, token=None):
         if callback == -1:
-            while not query.isFinished():
-                time.sleep(.0001)
-                QApplication.processEvents()
-            return self.handler(query, -1)
+            return future.wait(self.timeout)
+        if callback:
+            future.then(callback, token)
+        elif token is None:
+            future.pinned = True
+        return future
+
+    def clear_pending(self, *args):
+        self.pending.clear()
+
+    def forget_pending(self, key, future, *args):
+        if self.pending.get(key) is future:
+            del self.pending[key]
 
 
+    def on_transfer_timeout(self, query, future):
+        if future.is_finished or not query.isRunning():
+            return
+        logging.warning("{} query stalled for {}s. Aborting".format(future.method, self.timeout))
+        future.timed_out = True
+        query.abort()
 
-    def handler(self, response, callback):
+    def handler(self, response, future):
+        self.queries.remove(response)
+        if future.timer:
+            future.timer.stop()
+        if future.is_finished:
+            return future.response
         er = response.error()
         if er == QNetworkReply.NoError:
-            bytes_string = response.readAll()
-            data = str(bytes_string, 'ascii')
-            result = NebulaResponse(
-                    **json.loads(data)
-                )
+            decoder = future.decoder
+            decoder.feed(response)
+            status = response.attribute(QNetworkRequest.HttpStatusCodeAttribute)
+            if status == 304 and response_cache.etag(future.cache_key):
+                data = response_cache.get(future.cache_key)
+                logging.debug("{} not modified. Using cached response".format(future.method))
+            else:
+                text = decoder.finish()
+                if text is None:
+                    logging.error("Unable to decode {} response: {}".format(future.method, decoder.error))
+                    data = {"response" : 500, "message" : "Unable to decode server response"}
+                else:
+                    try:
+                        data = json.loads(text)
+                    except ValueError:
+                        log_traceback()
+                        data = {"response" : 500, "message" : "Unable to parse server response"}
+                if text is not None and future.cache_key and data.get("response", 200) < 400:
+                    etag = bytes(response.rawHeader(b"ETag")).decode("ascii") or content_etag(text)
+                    response_cache.store(future.cache_key, etag, data)
+            result = NebulaResponse(**data)
+            if recorder.active and future.method != "batch":
+                recorder.record_api(future.method, future.params, data, time.time() - future.start_time)
+            logging.debug("{} query finished in {:.03f}s (sent {}B, received {}B, decoded {}B)".format(
+                    future.method,
+                    time.time() - future.start_time,
+                    future.bytes_out,
+                    decoder.wire_size,
+                    decoder.size
+                ))
         else:
-            result = NebulaResponse(500, response.errorString())
-        self.queries.remove(response)
-        if callback and callback != -1:
-            callback(result)
+            # No HTTP status means the hub was not reached at all
+            status = response.attribute(QNetworkRequest.HttpStatusCodeAttribute)
+            if future.timed_out:
+                result = TransportError(408, "Request timed out")
+            elif not status or status in TRANSPORT_ERRORS:
+                result = TransportError(status or 503, response.errorString())
+            else:
+                result = NebulaResponse(status, response.errorString())
+
+        if is_transport_error(result):
+            self.breaker.failure()
+            if self.retry(future):
+                return result
+        else:
+            self.breaker.success()
+        future.resolve(result)
         return result
 
+    #
+    # Retries
+    #
+
+    def retry(self, future):
+        if future.method != "batch" and not is_read_query(future.method, future.params):
+            return False
+        if future.attempt >= RETRY_LIMIT or self.breaker.is_open:
+            return False
+        delay = min(RETRY_DELAY * 2**future.attempt, RETRY_MAX_DELAY)
+        delay *= random.uniform(0.8, 1.2)
+        future.attempt += 1
+        self.retry_count += 1
+        logging.debug("Retrying {} query in {:.01f}s (attempt {})".format(
+                future.method, delay, future.attempt + 1
+            ))
+        QTimer.singleShot(int(delay * 1000), functools.partial(self.resend, future))
+        return True
+
+    def resend(self, future):
+        if future.is_finished:
+            # Cancelled or timed out while waiting
+            return
+        future.decoder = ReplyDecoder()
+        self.send(future, future.method, future.params)
 
 
     def __getattr__(self, method_name):
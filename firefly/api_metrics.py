@@ -0,0 +1,122 @@
+import json
+import time
+
+__all__ = ["ApiMetrics", "LATENCY_BUCKETS"]
+
+# Upper bounds of latency histogram buckets in milliseconds
+LATENCY_BUCKETS = [50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+
+class MethodMetrics():
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.in_flight = 0
+        self.coalesced = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.total_time = 0
+        self.max_time = 0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def add_latency(self, duration):
+        self.total_time += duration
+        self.max_time = max(self.max_time, duration)
+        ms = duration * 1000
+        for i, limit in enumerate(LATENCY_BUCKETS):
+            if ms <= limit:
+                self.histogram[i] += 1
+                break
+        else:
+            self.histogram[-1] += 1
+
+    def percentile(self, p):
+        # Upper bound of the bucket containing given percentile
+        finished = sum(self.histogram)
+        if not finished:
+            return 0
+        threshold = finished * p / 100.0
+        total = 0
+        for i, value in enumerate(self.histogram):
+            total += value
+            if total >= threshold:
+                if i < len(LATENCY_BUCKETS):
+                    return LATENCY_BUCKETS[i] / 1000.0
+                return self.max_time
+        return self.max_time
+
+    @property
+    def avg_time(self):
+        # Cancelled queries have no latency
+        finished = sum(self.histogram)
+        return self.total_time / finished if finished > 0 else 0
+
+    def dump(self):
+        return {
+                "count" : self.count,
+                "errors" : self.errors,
+                "cancelled" : self.cancelled,
+                "in_flight" : self.in_flight,
+                "coalesced" : self.coalesced,
+                "bytes_in" : self.bytes_in,
+                "bytes_out" : self.bytes_out,
+                "avg_time" : self.avg_time,
+                "max_time" : self.max_time,
+                "p50" : self.percentile(50),
+                "p95" : self.percentile(95),
+                "histogram" : dict(zip([str(b) for b in LATENCY_BUCKETS] + ["inf"], self.histogram)),
+            }
+
+
+class ApiMetrics():
+    def __init__(self):
+        self.start_time = time.time()
+        self.methods = {}
+
+    def __getitem__(self, method):
+        if method not in self.methods:
+            self.methods[method] = MethodMetrics()
+        return self.methods[method]
+
+    def begin(self, future):
+        metrics = self[future.method]
+        metrics.count += 1
+        metrics.in_flight += 1
+        metrics.bytes_out += future.bytes_out
+
+    def end(self, future, *args):
+        metrics = self[future.method]
+        metrics.in_flight -= 1
+        metrics.bytes_in += future.decoder.wire_size
+        if future.response.response == 499:
+            # Superseded by navigation. Not a hub problem.
+            metrics.cancelled += 1
+            return
+        metrics.add_latency(time.time() - future.start_time)
+        if future.response.is_error:
+            metrics.errors += 1
+
+    def coalesce(self, method):
+        self[method].coalesced += 1
+
+    def reset(self):
+        self.start_time = time.time()
+        methods, self.methods = self.methods, {}
+        for method, metrics in methods.items():
+            # Keep queries in flight so they are accounted when finished
+            if metrics.in_flight:
+                self[method].count = self[method].in_flight = metrics.in_flight
+
+    def dump(self):
+        return {
+                "start_time" : self.start_time,
+                "dump_time" : time.time(),
+                "methods" : {method : metrics.dump() for method, metrics in self.methods.items()}
+            }
+
+    def save(self, path, **extra):
+        data = self.dump()
+        data.update(extra)
+        with open(path, "w") as f:
+            json.dump(data, f, indent=4)
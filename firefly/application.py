@@ -6,6 +6,9 @@ from pprint import pprint
 
 from .common import *
 from .filesystem import load_filesystem
+from .recorder import recorder
+from .write_queue import write_queue
+from .response_cache import response_cache
 
 from .dialogs.login import *
 from .dialogs.site_select import *
@@ -58,6 +61,12 @@ class FireflyApplication(Application):
         self.app_state_path = os.path.join(app_dir, "ffdata.{}.appstate".format(config["site_name"]))
         self.auth_key_path = os.path.join(app_dir,  "ffdata.{}.key".format(config["site_name"]))
 
+        if config.get("record_session"):
+            logging.info("Recording API and seismic traffic to {}".format(config["record_session"]))
+            recorder.open(config["record_session"])
+
+        response_cache.load()
+
         # Login
 
         session_id = None
@@ -83,6 +92,7 @@ class FireflyApplication(Application):
         load_filesystem()
         self.splash_message("Loading asset cache...")
         asset_cache.load()
+        write_queue.load()
         self.splash_message("Loading user workspace...")
         self.main_window = FireflyMainWindow(self, FireflyMainWidget)
 
@@ -98,6 +108,8 @@ class FireflyApplication(Application):
 
     def on_exit(self):
         asset_cache.save()
+        response_cache.save()
+        recorder.close()
         if not self.main_window.listener:
             return
         if config.get("session_id"):
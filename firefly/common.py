@@ -2,7 +2,7 @@ from nxtools import *
 from pyqtbs import *
 from .version import *
 
-from .api import api
+from .api import *
 
 from nx import *
 
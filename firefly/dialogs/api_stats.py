@@ -0,0 +1,114 @@
+from firefly import *
+from firefly.seismic import seismic_stats, seismic_router
+
+__all__ = ["api_stats_dialog"]
+
+COLUMNS = [
+        ["method", "Method"],
+        ["count", "Queries"],
+        ["in_flight", "In flight"],
+        ["errors", "Errors"],
+        ["cancelled", "Cancelled"],
+        ["coalesced", "Coalesced"],
+        ["avg_time", "Avg (s)"],
+        ["p50", "p50 (s)"],
+        ["p95", "p95 (s)"],
+        ["max_time", "Max (s)"],
+        ["bytes_out", "Sent (B)"],
+        ["bytes_in", "Received (B)"],
+    ]
+
+
+class ApiStatsDialog(QDialog):
+    def __init__(self, parent):
+        super(ApiStatsDialog, self).__init__(parent)
+        self.setWindowTitle("API statistics")
+        self.setStyleSheet(app_skin)
+
+        self.table = QTableWidget(self)
+        self.table.setColumnCount(len(COLUMNS))
+        self.table.setHorizontalHeaderLabels([title for key, title in COLUMNS])
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+
+        self.lanes_label = QLabel(self)
+
+        btn_refresh = QPushButton("Refresh")
+        btn_refresh.clicked.connect(self.load)
+
+        btn_reset = QPushButton("Reset")
+        btn_reset.clicked.connect(self.on_reset)
+
+        btn_save = QPushButton("Save...")
+        btn_save.clicked.connect(self.on_save)
+
+        buttons_layout = QHBoxLayout()
+        buttons_layout.addWidget(self.lanes_label, 1)
+        buttons_layout.addWidget(btn_refresh, 0)
+        buttons_layout.addWidget(btn_reset, 0)
+        buttons_layout.addWidget(btn_save, 0)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.table, 1)
+        layout.addLayout(buttons_layout, 0)
+        self.setLayout(layout)
+        self.resize(1000, 400)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.load)
+        self.timer.start(1000)
+        self.load()
+
+    def load(self):
+        data = api.metrics.dump()["methods"]
+        self.table.setRowCount(len(data))
+        for row, method in enumerate(sorted(data)):
+            values = data[method]
+            values["method"] = method
+            for col, (key, title) in enumerate(COLUMNS):
+                value = values[key]
+                if type(value) == float:
+                    value = "{:.03f}".format(value)
+                self.table.setItem(row, col, QTableWidgetItem(str(value)))
+
+        seismic = seismic_stats.dump()
+        slowest = seismic_router.slowest()
+        self.lanes_label.setText("  ".join(
+                ["{}: {} active, {} queued".format(lane, stats["active"], stats["queued"])
+                    for lane, stats in api.lane_stats().items()] +
+                ["seismic: {} queued (max {}), lag {:.02f}s (max {:.02f}s), {} coalesced".format(
+                    seismic["depth"],
+                    seismic["max_depth"],
+                    seismic["lag"],
+                    seismic["max_lag"],
+                    seismic["coalesced"]
+                )] +
+                (["slowest handler: {} ({:.03f}s)".format(slowest.name, slowest.max_time)]
+                    if slowest and slowest.count else [])
+            ))
+
+    def on_reset(self):
+        api.metrics.reset()
+        seismic_router.reset()
+        self.load()
+
+    def on_save(self):
+        path = QFileDialog.getSaveFileName(
+                self,
+                "Save API statistics",
+                os.path.abspath("ffstats.{}.json".format(config["site_name"])),
+                "JSON files (*.json)"
+            )[0]
+        if not path:
+            return
+        try:
+            api.metrics.save(path, lanes=api.lane_stats(), seismic=seismic_stats.dump(), seismic_routes=seismic_router.dump())
+        except Exception:
+            log_traceback("Unable to save API statistics")
+        else:
+            logging.info("API statistics saved to {}".format(path))
+
+
+def api_stats_dialog(parent=None):
+    dlg = ApiStatsDialog(parent)
+    dlg.exec_()
@@ -69,7 +69,11 @@ class BatchOpsDialog(QDialog):
             logging.info("Save aborted")
             return
 
-        response = api.set(objects=[a.id for a in self.objects], data={k : self.form[k] for k in self.form.changed})
+        response = api.set(
+                objects=[a.id for a in self.objects],
+                data={k : self.form[k] for k in self.form.changed},
+                durable=True
+            )
 
         if not response:
             logging.error(response.message)
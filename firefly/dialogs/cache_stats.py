@@ -0,0 +1,123 @@
+import json
+
+from firefly import *
+
+__all__ = ["cache_stats_dialog"]
+
+SUMMARY = [
+        ["hits", "Memory hits"],
+        ["db_hits", "Database hits"],
+        ["misses", "Misses"],
+        ["hit_ratio", "Hit ratio"],
+        ["stale", "Stale refreshes"],
+        ["evictions", "Evictions"],
+        ["requested", "Requested assets"],
+        ["avg_batch_size", "Avg. request size"],
+        ["memory_count", "Assets in memory"],
+        ["memory_bytes", "Memory (B)"],
+        ["db_count", "Assets in database"],
+        ["db_bytes", "Database (B)"],
+        ["load_time", "Load (s)"],
+        ["checkpoint_time", "Last checkpoint (s)"],
+    ]
+
+
+class CacheStatsDialog(QDialog):
+    def __init__(self, parent):
+        super(CacheStatsDialog, self).__init__(parent)
+        self.setWindowTitle("Asset cache statistics")
+        self.setStyleSheet(app_skin)
+
+        self.summary = QTableWidget(self)
+        self.summary.setColumnCount(2)
+        self.summary.setHorizontalHeaderLabels(["Counter", "Value"])
+        self.summary.verticalHeader().setVisible(False)
+        self.summary.setEditTriggers(QAbstractItemView.NoEditTriggers)
+
+        self.hottest = self.create_table(["ID", "Title", "Accesses"])
+        self.largest = self.create_table(["ID", "Title", "Size (B)"])
+
+        tabs = QTabWidget(self)
+        tabs.addTab(self.summary, "Summary")
+        tabs.addTab(self.hottest, "Hottest")
+        tabs.addTab(self.largest, "Largest")
+
+        btn_refresh = QPushButton("Refresh")
+        btn_refresh.clicked.connect(self.load)
+
+        btn_reset = QPushButton("Reset")
+        btn_reset.clicked.connect(self.on_reset)
+
+        btn_save = QPushButton("Save...")
+        btn_save.clicked.connect(self.on_save)
+
+        buttons_layout = QHBoxLayout()
+        buttons_layout.addStretch(1)
+        buttons_layout.addWidget(btn_refresh, 0)
+        buttons_layout.addWidget(btn_reset, 0)
+        buttons_layout.addWidget(btn_save, 0)
+
+        layout = QVBoxLayout()
+        layout.addWidget(tabs, 1)
+        layout.addLayout(buttons_layout, 0)
+        self.setLayout(layout)
+        self.resize(600, 500)
+        self.load()
+
+    def create_table(self, headers):
+        table = QTableWidget(self)
+        table.setColumnCount(len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.verticalHeader().setVisible(False)
+        table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        return table
+
+    def fill_table(self, table, data):
+        table.setRowCount(len(data))
+        for row, (id_asset, value) in enumerate(data):
+            asset = asset_cache.peek(id_asset)
+            title = asset["title"] if asset else ""
+            for col, text in enumerate([id_asset, title, value]):
+                table.setItem(row, col, QTableWidgetItem(str(text)))
+
+    def load(self):
+        stats = asset_cache.stats()
+        rows = [[title, stats[key]] for key, title in SUMMARY if key in stats]
+        self.summary.setRowCount(len(rows))
+        for row, (title, value) in enumerate(rows):
+            if type(value) == float:
+                value = "{:.03f}".format(value)
+            self.summary.setItem(row, 0, QTableWidgetItem(title))
+            self.summary.setItem(row, 1, QTableWidgetItem(str(value)))
+        self.fill_table(self.hottest, asset_cache.metrics.hottest())
+        self.fill_table(self.largest, asset_cache.largest())
+
+    def on_reset(self):
+        asset_cache.metrics.reset()
+        self.load()
+
+    def on_save(self):
+        path = QFileDialog.getSaveFileName(
+                self,
+                "Save asset cache statistics",
+                os.path.abspath("ffcache.{}.json".format(config["site_name"])),
+                "JSON files (*.json)"
+            )[0]
+        if not path:
+            return
+        data = asset_cache.stats()
+        data["hottest"] = asset_cache.metrics.hottest()
+        data["largest"] = asset_cache.largest()
+        try:
+            with open(path, "w") as f:
+                json.dump(data, f, indent=4)
+        except Exception:
+            log_traceback("Unable to save asset cache statistics")
+        else:
+            logging.info("Asset cache statistics saved to {}".format(path))
+
+
+def cache_stats_dialog(parent=None):
+    dlg = CacheStatsDialog(parent)
+    dlg.exec_()
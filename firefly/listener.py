@@ -1,8 +1,11 @@
 import json
 import time
+import threading
+import collections
 import websocket
 
 from .common import *
+from .recorder import recorder
 from nx import CLIENT_ID
 
 
@@ -11,6 +14,13 @@ if config.get("debug"):
 
 __all__ = ["SeismicListener"]
 
+# Maximum number of messages waiting for the GUI thread. When the queue
+# is full, the oldest messages are dropped and the client resynchronizes.
+SEISMIC_QUEUE_LIMIT = 10000
+
+# Number of recent connection outages kept for diagnostics
+OUTAGE_HISTORY = 50
+
 def readlines(f):
     buff = b""
     for ch in f.iter_content(1):
@@ -26,15 +36,30 @@ def readlines(f):
 class SeismicMessage(object):
     def __init__(self, packet):
         self.timestamp, self.site_name, self.host, self.method, self.data = packet
+        self.received = time.time()
 
 class SeismicListener(QThread):
+    # Local time of the disconnect, local time of the reconnect and hub
+    # time of the last message received before the disconnect (0 if none)
+    reconnected = pyqtSignal(float, float, float)
+    message_ready = pyqtSignal()
+
     def __init__(self, site_name, addr, port):
         QThread.__init__(self, None)
         self.site_name = site_name
         self.should_run = True
         self.active = False
+        self.connect_count = 0
         self.last_msg = time.time()
-        self.queue = []
+        self.last_timestamp = 0
+        self.disconnected_at = 0
+        self.outages = collections.deque(maxlen=OUTAGE_HISTORY)
+        self.queue = collections.deque()
+        self.lock = threading.Lock()
+        self.notified = False
+        self.overflowed = False
+        self.dropped = 0
+        self.dropped_since = 0
         self.start()
 
     def run(self):
@@ -44,25 +69,35 @@ class SeismicListener(QThread):
             self.halted = False
             self.ws = websocket.WebSocketApp(
                     addr,
+                    on_open = self.on_open,
                     on_message = self.on_message,
                     on_error = self.on_error,
                     on_close = self.on_close
                 )
             self.ws.run_forever()
-            self.active = False
+            self.mark_disconnected()
 
         logging.debug("Listener halted", handlers=False)
         self.halted = True
 
 
+    def on_open(self, *args):
+        logging.goodnews("Listener connected", handlers=False)
+        self.active = True
+        self.connect_count += 1
+        if self.connect_count > 1:
+            # Messages sent while disconnected are lost
+            outage = [self.disconnected_at or self.last_msg, time.time()]
+            self.outages.append(outage)
+            self.reconnected.emit(outage[0], outage[1], self.last_timestamp)
+
     def on_message(self, *args):
         data = args[-1]
-
-        if not self.active:
-            logging.goodnews("Listener connected", handlers=False)
-            self.active = True
         try:
-            message = SeismicMessage(json.loads(data))
+            packet = json.loads(data)
+            if recorder.active:
+                recorder.record_seismic(packet)
+            message = SeismicMessage(packet)
         except Exception:
             log_traceback(handlers=False)
             logging.debug("Malformed seismic message detected: {}".format(data), handlers=False)
@@ -72,21 +107,55 @@ class SeismicListener(QThread):
             return
 
         self.last_msg = time.time()
+        self.last_timestamp = message.timestamp
 
         if message.data and message.data.get("initiator", None) == CLIENT_ID:
             return
 
-        self.queue.append(message)
+        self.push(message)
+
+    def push(self, message):
+        with self.lock:
+            if len(self.queue) >= SEISMIC_QUEUE_LIMIT:
+                dropped = self.queue.popleft()
+                self.dropped += 1
+                if not self.overflowed:
+                    self.dropped_since = dropped.timestamp
+                self.overflowed = True
+            self.queue.append(message)
+            # Wake up the GUI thread once per batch of messages
+            if self.notified:
+                return
+            self.notified = True
+        self.message_ready.emit()
+
+    def take(self):
+        """Returns queued messages and hub time of the oldest dropped one.
+
+        The time is 0 if no messages were dropped since the last call.
+        """
+        with self.lock:
+            messages = list(self.queue)
+            self.queue.clear()
+            self.notified = False
+            dropped_since = self.dropped_since if self.overflowed else 0
+            self.overflowed = False
+        return messages, dropped_since
 
     def on_error(self, *args):
         error = args[-1]
         logging.error(error, handlers=False)
 
     def on_close(self, *args):
-        self.active = False
+        self.mark_disconnected()
         if self.should_run:
             logging.warning("WS connection interrupted", handlers=False)
 
+    def mark_disconnected(self):
+        if self.active:
+            self.disconnected_at = time.time()
+        self.active = False
+
     def halt(self):
         logging.debug("Shutting down listener")
         self.should_run = False
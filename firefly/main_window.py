@@ -1,10 +1,19 @@
 from .common import *
 from .modules import *
+from .view import refresh_asset_models
 from .menu import create_menu
 from .listener import SeismicListener, SeismicMessage
+from .write_queue import write_queue
+from .seismic import coalesce_messages, seismic_stats, seismic_router, SeismicCatchUp
+from .dialogs.api_stats import api_stats_dialog
+from .dialogs.cache_stats import cache_stats_dialog
 
 __all__ = ["FireflyMainWidget", "FireflyMainWindow"]
 
+# Time spent handling seismic messages before yielding to the
+# event loop (seconds)
+SEISMIC_BUDGET = 0.025
+
 
 class FireflyMainWidget(QWidget):
     def __init__(self, main_window):
@@ -22,27 +31,38 @@ class FireflyMainWidget(QWidget):
         self.detail = DetailModule(self)
         self.tabs.addTab(self.detail, "DETAIL")
 
-        self.main_window.add_subscriber(self.browser, ["objects_changed"])
-        self.main_window.add_subscriber(self.detail, ["objects_changed"])
-
         # Jobs module
 
         if config["actions"]:
             self.jobs = JobsModule(self)
             self.tabs.addTab(self.jobs, "JOBS")
-            self.main_window.add_subscriber(self.jobs, ["job_progress"])
+            seismic_router.subscribe(
+                    "job_progress",
+                    self.jobs.seismic_handler,
+                    predicate=lambda message: self.current_module == self.jobs and self.jobs.id_view == "active"
+                )
 
         # Channel control modules
 
         if config["playout_channels"]:
             if user.has_right("scheduler_view", anyval=True) or user.has_right("scheduler_edit", anyval=True):
                 self.scheduler = SchedulerModule(self)
-                self.main_window.add_subscriber(self.scheduler, ["objects_changed"])
+                seismic_router.subscribe(
+                        "objects_changed",
+                        self.scheduler.seismic_handler,
+                        predicate=lambda message: message.data["object_type"] == "event"
+                    )
                 self.tabs.addTab(self.scheduler, "SCHEDULER")
 
             if user.has_right("rundown_view", anyval=True) or user.has_right("rundown_edit", anyval=True):
                 self.rundown = RundownModule(self)
-                self.main_window.add_subscriber(self.rundown, ["objects_changed", "rundown_changed", "playout_status", "job_progress"])
+                # playout_status is routed by the rundown itself, following its channel
+                for method in ["objects_changed", "rundown_changed", "job_progress"]:
+                    seismic_router.subscribe(
+                            method,
+                            self.rundown.seismic_handler,
+                            predicate=lambda message: self.current_module == self.rundown
+                        )
                 self.tabs.addTab(self.rundown, "RUNDOWN")
 
         # Layout
@@ -107,7 +127,12 @@ class FireflyMainWidget(QWidget):
 
 class FireflyMainWindow(MainWindow):
     def __init__(self, parent, MainWidgetClass):
-        self.subscribers = []
+        seismic_router.subscribe(
+                "objects_changed",
+                self.on_assets_changed,
+                predicate=lambda message: message.data["object_type"] == "asset"
+            )
+        seismic_router.subscribe("config_changed", self.on_config_changed)
         asset_cache.api = api
         asset_cache.handler = self.on_assets_update
 
@@ -125,10 +150,19 @@ class FireflyMainWindow(MainWindow):
                 config["seismic_addr"],
                 int(config["seismic_port"])
             )
+        self.listener.reconnected.connect(self.on_listener_reconnected)
+        self.listener.message_ready.connect(self.on_seismic_messages, Qt.QueuedConnection)
+        self.seismic_pending = []
 
         self.seismic_timer = QTimer(self)
         self.seismic_timer.timeout.connect(self.on_seismic_timer)
-        self.seismic_timer.start(40)
+        self.seismic_timer.start(5000)
+
+        self.pending_writes_label = QLabel(self)
+        self.pending_writes_label.setToolTip("Changes waiting for the connection to the hub")
+        self.statusBar().addPermanentWidget(self.pending_writes_label)
+        write_queue.changed.connect(self.on_pending_writes)
+        self.on_pending_writes(len(write_queue))
 
         self.load_window_state()
 
@@ -143,6 +177,7 @@ class FireflyMainWindow(MainWindow):
 
 
         logging.info("[MAIN WINDOW] Firefly is ready")
+        asset_cache.sync(lane=LANE_BACKGROUND)
 
 
 
@@ -240,6 +275,16 @@ class FireflyMainWindow(MainWindow):
     def toggle_debug_mode(self):
         config["debug"] = not config.get("debug")
 
+    def on_pending_writes(self, count):
+        self.pending_writes_label.setText("{} unsaved change{}".format(count, "s" if count > 1 else ""))
+        self.pending_writes_label.setVisible(bool(count))
+
+    def show_api_stats(self):
+        api_stats_dialog(self)
+
+    def show_cache_stats(self):
+        cache_stats_dialog(self)
+
     def refresh_plugins(self):
         self.rundown.plugins.load()
 
@@ -295,40 +340,63 @@ class FireflyMainWindow(MainWindow):
     #
 
     def on_seismic_timer(self):
-        now = time.time()
-        if now - self.listener.last_msg > 5:
+        if time.time() - self.listener.last_msg > 5:
             logging.debug("No seismic message received. Something may be wrong")
             self.listener.last_msg = time.time()
-        try:
-            message = self.listener.queue.pop(0)
-        except IndexError:
-            pass
-        else:
-            self.seismic_handler(message)
 
-    def add_subscriber(self, module, methods):
-        self.subscribers.append([module, methods])
+    def on_seismic_messages(self):
+        now = time.time()
+        messages, dropped_since = self.listener.take()
+        if dropped_since:
+            logging.warning("Seismic queue overflow ({} messages dropped so far). Resynchronizing".format(
+                    self.listener.dropped
+                ))
+            seismic_stats.dropped = self.listener.dropped
+            SeismicCatchUp(self.main_widget, dropped_since, "queue overflow").run()
+        seismic_stats.received += len(messages)
+        messages = self.seismic_pending + messages
+        if not messages:
+            return
+        lag = now - messages[0].received
+        count = len(messages)
+        messages = coalesce_messages(messages)
+        seismic_stats.coalesced += count - len(messages)
+
+        self.seismic_pending = []
+        deadline = now + SEISMIC_BUDGET
+        for i, message in enumerate(messages):
+            if time.time() > deadline:
+                # Let the GUI breathe and continue in the next iteration
+                self.seismic_pending = messages[i:]
+                QTimer.singleShot(0, self.on_seismic_messages)
+                break
+            self.seismic_handler(message)
+            seismic_stats.handled += 1
+        seismic_stats.update(len(self.seismic_pending) + len(self.listener.queue), lag)
 
     def seismic_handler(self, message):
-        if message.method == "objects_changed" and message.data["object_type"] == "asset":
-            logging.info("Requesting new data for objects {}".format(message.data["objects"]))
-            now = time.time()
-            asset_cache.request([[aid, now] for aid in message.data["objects"]])
-            return
+        seismic_router.dispatch(message)
 
-        if message.method == "config_changed":
-            self.load_settings()
-            return
+    def on_assets_changed(self, message):
+        logging.info("Requesting new data for objects {}".format(message.data["objects"]))
+        now = time.time()
+        asset_cache.request([[aid, now] for aid in message.data["objects"]])
+
+    def on_config_changed(self, message):
+        self.load_settings()
 
-        for module, methods in self.subscribers:
-            if message.method in methods:
-                module.seismic_handler(message)
 
+    def on_listener_reconnected(self, disconnected_at, reconnected_at, since):
+        outage = reconnected_at - disconnected_at
+        logging.warning("Seismic connection was interrupted for {:.01f}s (since {}). Resynchronizing".format(
+                outage,
+                format_time(disconnected_at)
+            ))
+        SeismicCatchUp(self.main_widget, since, "{:.01f}s outage".format(outage)).run()
 
     def on_assets_update(self, *assets):
         logging.debug("Updating {} assets in views".format(len(assets)))
 
-        self.browser.refresh_assets(*assets)
+        # Browser tabs and rundown
+        refresh_asset_models(*assets)
         self.detail.refresh_assets(*assets)
-        if self.rundown:
-            self.rundown.refresh_assets(*assets)
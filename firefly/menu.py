@@ -172,6 +172,17 @@ def create_menu(wnd):
     wnd.action_debug.triggered.connect(wnd.toggle_debug_mode)
 
     menu_help.addAction(wnd.action_debug)
+
+    action_api_stats = QAction('&API statistics...', wnd)
+    action_api_stats.setStatusTip('Show API latency and traffic statistics')
+    action_api_stats.triggered.connect(wnd.show_api_stats)
+    menu_help.addAction(action_api_stats)
+
+    action_cache_stats = QAction('Asset &cache statistics...', wnd)
+    action_cache_stats.setStatusTip('Show asset cache hit rates and contents')
+    action_cache_stats.triggered.connect(wnd.show_cache_stats)
+    menu_help.addAction(action_cache_stats)
+
     menu_help.addSeparator()
 
 
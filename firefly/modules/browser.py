@@ -438,10 +438,7 @@ class BrowserTab(QWidget):
     def refresh_assets(self, *objects, request_data=False):
         if request_data:
             asset_cache.request([[aid, 0] for aid in objects])
-        for row, obj in enumerate(self.model().object_data):
-            if obj.id in objects:
-                self.model().object_data[row] = asset_cache[obj.id]
-                self.model().dataChanged.emit(self.model().index(row, 0), self.model().index(row, len(self.model().header_data)-1))
+        self.model().refresh_asset_rows(objects)
 
 
     def seismic_handler(self, message):
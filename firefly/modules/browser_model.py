@@ -1,10 +1,21 @@
 import math
 from firefly import *
+from firefly.prefetch import prefetcher, browser_assets
 
 DEFAULT_HEADER_DATA = ["title", "duration", "id_folder"]
 RECORDS_PER_PAGE = 1000
 
 class BrowserModel(FireflyViewModel):
+    displays_assets = True
+
+    def __init__(self, *args, **kwargs):
+        super(BrowserModel, self).__init__(*args, **kwargs)
+        self.cancel_token = CancelToken()
+        self.search_query = {}
+
+    def update_asset_row(self, row):
+        self.object_data[row] = asset_cache[self.object_data[row].id]
+
     def load(self, callback, **kwargs):
         start_time = time.time()
 
@@ -15,8 +26,14 @@ class BrowserModel(FireflyViewModel):
 
         search_query = kwargs
         search_query["result"] = ["id", "mtime"]
-        response = api.get(
+        self.search_query = dict(search_query)
+
+        # Only the latest search is rendered
+        self.cancel_token.cancel()
+        self.cancel_token = CancelToken()
+        api.get(
                 functools.partial(self.load_callback, callback),
+                cancel_token=self.cancel_token,
                 **search_query,
                 count=True,
                 limit=RECORDS_PER_PAGE,
@@ -37,6 +54,12 @@ class BrowserModel(FireflyViewModel):
             self.parent().set_num_pages(page_count)
             asset_cache.request(response.data)
             self.object_data = [asset_cache.get(row[0]) for row in response.data]
+            current_page = self.parent().current_page
+            if current_page < page_count:
+                next_page = dict(self.search_query)
+                next_page["limit"] = RECORDS_PER_PAGE
+                next_page["offset"] = current_page * RECORDS_PER_PAGE
+                prefetcher.schedule("browser", ["get", next_page, browser_assets])
 
         self.endResetModel()
         QApplication.restoreOverrideCursor()
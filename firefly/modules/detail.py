@@ -1,3 +1,5 @@
+import functools
+
 from firefly.modules.detail_toolbars import *
 from firefly.modules.detail_subclips import *
 
@@ -360,7 +362,11 @@ class DetailModule(BaseModule):
                     )
 
             if reply == QMessageBox.Yes:
-                self.on_apply()
+                # Changes must be stored before another asset is focused
+                # or the application quits
+                future = self.on_apply()
+                if future:
+                    future.wait(api.timeout)
 
     def focus(self, asset, silent=False, force=False):
         if not isinstance(asset, Asset):
@@ -491,17 +497,24 @@ class DetailModule(BaseModule):
 
 #        self.form.setEnabled(False) # reenable on seismic message with new data
 
-        response = api.set(objects=[self.asset.id], data=data)
+        return api.set(
+                functools.partial(self.on_apply_response, self.asset),
+                objects=[self.asset.id],
+                data=data,
+                durable=True
+            )
+
+    def on_apply_response(self, asset, response):
         if not response:
             logging.error(response.message)
-        else:
-            logging.debug("[DETAIL] Set method responded", response.response)
-            try:
-                aid = response.data[0]
-            except Exception:
-                aid = self.asset.id
-            self.asset["id"] = aid
-            asset_cache.request([[aid, 0]])
+            return
+        logging.debug("[DETAIL] Set method responded", response.response)
+        try:
+            aid = response.data[0]
+        except Exception:
+            aid = asset.id
+        asset["id"] = aid
+        asset_cache.request([[aid, 0]])
 
         #self.form.setEnabled(True)
 
@@ -524,20 +537,23 @@ class DetailModule(BaseModule):
         if self.asset["qc/report"]:
             report = self.asset["qc/report"] + "\n" + report
 
-        response = api.set(
+        api.set(
+                functools.partial(self.on_set_qc_response, self.asset.id),
                 objects=[self.asset.id],
                 data={
                     "qc/state" : state,
                     "qc/report" : report
                 }
             )
+
+    def on_set_qc_response(self, id_asset, response):
         if not response:
             logging.error(response.message)
             return
         try:
             aid = response.data[0]
         except Exception:
-            aid = self.asset.id
+            aid = id_asset
         asset_cache.request([[aid, 0]])
 
     def seismic_handler(self, data):
@@ -67,11 +67,6 @@ class JobsModule(BaseModule):
         self.load(view=id_view)
 
     def seismic_handler(self, message):
-        if self.main_window.current_module != self.main_window.jobs:
-            return
-        if self.id_view != "active":
-            return
-
         d = message.data
         do_reload = False
         for i, row in enumerate(self.view.model.object_data):
@@ -88,6 +88,8 @@ class JobsModel(FireflyViewModel):
         self.request_data = {
                     "view" : "active"
                 }
+        self.waiting = {}
+
     def headerData(self, col, orientation=Qt.Horizontal, role=Qt.DisplayRole):
         if orientation == Qt.Horizontal and role == Qt.DisplayRole:
             return header_format[self.header_data[col]]
@@ -112,21 +114,30 @@ class JobsModel(FireflyViewModel):
 
     def load(self, **kwargs):
         self.request_data.update(kwargs)
-        start_time = time.time()
+        self.parent().setCursor(Qt.BusyCursor)
+        api.jobs(self.load_callback, **self.request_data)
+
+    def load_callback(self, response):
         self.beginResetModel()
-        QApplication.setOverrideCursor(Qt.WaitCursor)
         self.object_data = []
-        response = api.jobs(**self.request_data)
+        self.waiting = {}
         if not response:
             logging.error(response.message)
         else:
             request_assets = []
-            for row in response.data:
+            for i, row in enumerate(response.data):
                 self.object_data.append(row)
                 request_assets.append([row["id_asset"], 0])
+                if asset_cache.is_missing(row["id_asset"]):
+                    self.waiting.setdefault(row["id_asset"], []).append(i)
+                    asset_cache.subscribe(row["id_asset"], self.on_asset_loaded)
             asset_cache.request(request_assets)
         self.endResetModel()
-        QApplication.restoreOverrideCursor()
+        self.parent().setCursor(Qt.ArrowCursor)
+
+    def on_asset_loaded(self, id_asset):
+        for row in self.waiting.pop(id_asset, []):
+            self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.header_data)-1))
 
 
 class FireflyJobsView(FireflyView):
@@ -179,16 +190,12 @@ class FireflyJobsView(FireflyView):
 
 
     def on_restart(self, jobs):
-        response = api.jobs(restart=jobs)
-        if not response:
-            logging.error(response.message)
-        else:
-            logging.info(response.message)
-        self.model.load()
-
+        api.jobs(self.on_jobs_response, restart=jobs)
 
     def on_abort(self, jobs):
-        response = api.jobs(abort=jobs)
+        api.jobs(self.on_jobs_response, abort=jobs)
+
+    def on_jobs_response(self, response):
         if not response:
             logging.error(response.message)
         else:
@@ -5,6 +5,9 @@ import functools
 from firefly import *
 from firefly.dialogs.send_to import SendToDialog
 
+from firefly.prefetch import prefetcher, rundown_assets
+from firefly.seismic import seismic_router
+
 from .rundown_utils import *
 from .rundown_mcr import MCR
 from .rundown_plugins import PlayoutPlugins
@@ -19,6 +22,7 @@ class RundownModule(BaseModule):
         self.cued_item = False
         self.last_search = ""
         self.first_load = True
+        self.playout_route = None
 
         self.edit_wanted = self.app_state.get("edit_enabled", True)
         self.edit_enabled = False
@@ -66,6 +70,20 @@ class RundownModule(BaseModule):
 
 
 
+    @BaseModule.id_channel.setter
+    def id_channel(self, value):
+        BaseModule.id_channel.fset(self, value)
+        # Only playout status of the displayed channel is delivered
+        if self.playout_route is None:
+            self.playout_route = seismic_router.subscribe(
+                    "playout_status",
+                    self.seismic_handler,
+                    id_channel=self.id_channel,
+                    predicate=lambda message: self.main_window.current_module == self.main_window.rundown
+                )
+        else:
+            seismic_router.move(self.playout_route, self.id_channel)
+
     @property
     def can_edit(self):
         return user.has_right("rundown_edit", self.id_channel)
@@ -101,6 +119,10 @@ class RundownModule(BaseModule):
             self.start_time = day_start(time.time(), self.playout_config["day_start"])
 
         self.view.model().load(functools.partial(self.load_callback, do_update_header, selection, event))
+        prefetcher.schedule("rundown", *[
+                ["rundown", {"id_channel" : self.id_channel, "start_time" : self.start_time + offset}, rundown_assets]
+                for offset in [3600*24, -3600*24]
+            ])
 
 
 
@@ -269,13 +291,7 @@ class RundownModule(BaseModule):
     #
 
     def seismic_handler(self, message):
-        if self.main_window.current_module != self.main_window.rundown:
-            return
-
         if message.method == "playout_status":
-            if message.data["id_channel"] != self.id_channel:
-                return
-
             if message.data["current_item"] != self.current_item:
                 self.current_item = message.data["current_item"]
                 self.view.model().refresh_items([self.current_item])
@@ -308,10 +324,9 @@ class RundownModule(BaseModule):
             if self.playout_config.get("send_action", 0) == message.data["id_action"]:
 
                 model = self.view.model()
-                for row, obj in enumerate(model.object_data):
-                    if obj["id_asset"] == message.data["id_asset"]:
-                        model.object_data[row].transfer_progress = message.data["progress"]
-                        model.dataChanged.emit(model.index(row, 0), model.index(row, len(model.header_data)-1))
+                for row in model.rows_for_asset(message.data["id_asset"]):
+                    model.object_data[row].transfer_progress = message.data["progress"]
+                    model.dataChanged.emit(model.index(row, 0), model.index(row, len(model.header_data)-1))
 
 
     def refresh_assets(self, *assets):
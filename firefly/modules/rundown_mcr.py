@@ -149,23 +149,26 @@ class MCR(QWidget):
         return self.parent().id_channel
 
     def on_take(self):
-        api.playout(timeout=1, action="take", id_channel=self.id_channel)
+        api.playout(self.on_playout_response, timeout=1, action="take", id_channel=self.id_channel)
 
     def on_freeze(self):
-        api.playout(timeout=1, action="freeze", id_channel=self.id_channel)
+        api.playout(self.on_playout_response, timeout=1, action="freeze", id_channel=self.id_channel)
 
     def on_retake(self):
-        api.playout(timeout=1, action="retake", id_channel=self.id_channel)
+        api.playout(self.on_playout_response, timeout=1, action="retake", id_channel=self.id_channel)
 
     def on_abort(self):
-        api.playout(timeout=1, action="abort", id_channel=self.id_channel)
+        api.playout(self.on_playout_response, timeout=1, action="abort", id_channel=self.id_channel)
 
     def on_cue_forward(self):
-        api.playout(timeout=1, action="cue_forward", id_channel=self.id_channel)
+        api.playout(self.on_playout_response, timeout=1, action="cue_forward", id_channel=self.id_channel)
 
     def on_cue_backward(self):
-        api.playout(timeout=1, action="cue_backward", id_channel=self.id_channel)
+        api.playout(self.on_playout_response, timeout=1, action="cue_backward", id_channel=self.id_channel)
 
+    def on_playout_response(self, response):
+        if not response:
+            logging.error(response.message)
 
     def seismic_handler(self, data):
         status = data.data
@@ -18,10 +18,13 @@ DEFAULT_COLUMNS = [
 
 
 class RundownModel(FireflyViewModel):
+    displays_assets = True
+
     def __init__(self, *args, **kwargs):
         super(RundownModel, self).__init__(*args, **kwargs)
         self.event_ids = []
         self.load_start_time = 0
+        self.cancel_token = CancelToken()
 
     @property
     def id_channel(self):
@@ -43,7 +46,15 @@ class RundownModel(FireflyViewModel):
         self.load_start_time = time.time()
         self.parent().setCursor(Qt.BusyCursor)
         self.current_callback=callback
-        api.rundown(self.load_callback, id_channel=self.id_channel, start_time=self.start_time)
+        # Drop the response of a previous day if it did not arrive yet
+        self.cancel_token.cancel()
+        self.cancel_token = CancelToken()
+        api.rundown(
+                self.load_callback,
+                cancel_token=self.cancel_token,
+                id_channel=self.id_channel,
+                start_time=self.start_time
+            )
 
 
     def load_callback(self, response):
@@ -99,11 +110,17 @@ class RundownModel(FireflyViewModel):
         if self.current_callback:
             self.current_callback()
 
+    def row_asset_id(self, obj):
+        if obj.object_type == "item":
+            return obj["id_asset"]
+        return None
+
+    def update_asset_row(self, row):
+        obj = self.object_data[row]
+        obj._asset = asset_cache.get(obj["id_asset"])
+
     def refresh_assets(self, assets):
-        for row in range(len(self.object_data)):
-            if self.object_data[row].object_type == "item" and self.object_data[row]["id_asset"] in assets:
-                self.object_data[row]._asset = asset_cache.get(self.object_data[row]["id_asset"])
-                self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.header_data)-1))
+        self.refresh_asset_rows(assets)
 
     def refresh_items(self, items):
         for row, obj in enumerate(self.object_data):
@@ -201,14 +201,13 @@ class RundownView(FireflyView):
             logging.error("You are not allowed to modify this rundown")
             return
         mode = not self.selected_objects[0]["loop"]
-        QApplication.processEvents()
-        QApplication.setOverrideCursor(Qt.WaitCursor)
-        response = api.set(object_type=self.selected_objects[0].object_type, objects=[obj.id for obj in self.selected_objects], data={"loop" : mode})
-        QApplication.restoreOverrideCursor()
-        if not response:
-            logging.error(response.message)
-            return
-        self.model().load()
+        self.setCursor(Qt.BusyCursor)
+        api.set(
+                self.on_response_reload,
+                object_type=self.selected_objects[0].object_type,
+                objects=[obj.id for obj in self.selected_objects],
+                data={"loop" : mode}
+            )
 
 
 
@@ -216,10 +215,17 @@ class RundownView(FireflyView):
         if not self.parent().can_edit:
             logging.error("You are not allowed to modify this rundown")
             return
-        QApplication.processEvents()
-        QApplication.setOverrideCursor(Qt.WaitCursor)
-        response = api.set(object_type=self.selected_objects[0].object_type, objects=[obj.id for obj in self.selected_objects], data={"run_mode":mode})
-        QApplication.restoreOverrideCursor()
+        self.setCursor(Qt.BusyCursor)
+        api.set(
+                self.on_response_reload,
+                object_type=self.selected_objects[0].object_type,
+                objects=[obj.id for obj in self.selected_objects],
+                data={"run_mode":mode},
+                durable=True
+            )
+
+    def on_response_reload(self, response):
+        self.setCursor(Qt.ArrowCursor)
         if not response:
             logging.error(response.message)
             return
@@ -231,10 +237,15 @@ class RundownView(FireflyView):
 
 
     def on_solve(self, solver):
-        QApplication.processEvents()
-        QApplication.setOverrideCursor(Qt.WaitCursor)
-        response = api.solve(id_item=self.selected_objects[0]["id"], solver=solver)
-        QApplication.restoreOverrideCursor()
+        self.setCursor(Qt.BusyCursor)
+        api.solve(
+                self.on_solve_response,
+                id_item=self.selected_objects[0]["id"],
+                solver=solver
+            )
+
+    def on_solve_response(self, response):
+        self.setCursor(Qt.ArrowCursor)
         if not response:
             logging.error(response.message)
         self.model().load()
@@ -263,28 +274,44 @@ class RundownView(FireflyView):
             if ret != QMessageBox.Yes:
                 return
 
+        self.setCursor(Qt.BusyCursor)
         if items:
-            QApplication.processEvents()
-            QApplication.setOverrideCursor(Qt.WaitCursor)
-            response = api.delete(object_type="item", objects=items)
-            QApplication.restoreOverrideCursor()
-            if not response:
-                logging.error(response.message)
-                return
-            else:
-                logging.info("Item deleted: {}".format(response.message))
+            api.delete(
+                    functools.partial(self.on_delete_items_response, events),
+                    object_type="item",
+                    objects=items
+                )
+        else:
+            self.delete_events(events)
+
+    def on_delete_items_response(self, events, response):
+        if not response:
+            self.setCursor(Qt.ArrowCursor)
+            logging.error(response.message)
+            return
+        logging.info("Item deleted: {}".format(response.message))
+        self.delete_events(events)
 
+    def delete_events(self, events):
         if events:
-            QApplication.processEvents()
-            QApplication.setOverrideCursor(Qt.WaitCursor)
-            response = api.schedule(delete=events, id_channel=self.parent().id_channel)
-            QApplication.restoreOverrideCursor()
-            if not response:
-                logging.error(response.message)
-                return
-            else:
-                logging.info("Event deleted: {}".format(response.message))
+            api.schedule(
+                    self.on_delete_events_response,
+                    delete=events,
+                    id_channel=self.parent().id_channel
+                )
+        else:
+            self.on_delete_finished()
+
+    def on_delete_events_response(self, response):
+        if not response:
+            self.setCursor(Qt.ArrowCursor)
+            logging.error(response.message)
+            return
+        logging.info("Event deleted: {}".format(response.message))
+        self.on_delete_finished()
 
+    def on_delete_finished(self):
+        self.setCursor(Qt.ArrowCursor)
         self.selectionModel().clear()
         self.model().load()
 
@@ -307,15 +334,13 @@ class RundownView(FireflyView):
                 data[key] = dlg.meta[key]
         if not data:
             return
-        response = api.set(
+        self.setCursor(Qt.BusyCursor)
+        api.set(
+                self.on_response_reload,
                 object_type=obj.object_type,
                 objects=[obj.id],
                 data=data
             )
-        if not response:
-            logging.error(response.message)
-            return
-        self.model().load()
 
     def on_edit_event(self):
         objs = [obj for obj in self.selected_objects if obj.object_type == "event"]
@@ -332,9 +357,13 @@ class RundownView(FireflyView):
                     self.on_edit_item()
 
                 elif self.parent().mcr and self.parent().mcr.isVisible() and can_mcr:
-                    response = api.playout(timeout=1, action="cue", id_channel=self.id_channel, id_item=obj.id)
-                    if not response:
-                        logging.error(response.message)
+                    api.playout(
+                            self.on_playout_response,
+                            timeout=1,
+                            action="cue",
+                            id_channel=self.id_channel,
+                            id_item=obj.id
+                        )
                     self.clearSelection()
 
 
@@ -345,6 +374,10 @@ class RundownView(FireflyView):
         self.clearSelection()
 
 
+    def on_playout_response(self, response):
+        if not response:
+            logging.error(response.message)
+
     def dragMoveEvent(self, event):
         super(RundownView, self).dragMoveEvent(event)
         if event.mimeData().hasFormat("application/nx.item"):
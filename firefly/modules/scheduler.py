@@ -167,10 +167,13 @@ class SchedulerModule(BaseModule):
         if not events:
             QApplication.restoreOverrideCursor()
             return
-        response = api.schedule(
+        api.schedule(
+                self.import_template_callback,
                 id_channel=self.id_channel,
                 events=events
             )
+
+    def import_template_callback(self, response):
         QApplication.restoreOverrideCursor()
         if not response:
             logging.error(response.message)
@@ -211,11 +214,10 @@ class SchedulerModule(BaseModule):
         self.load()
 
     def seismic_handler(self, data):
-       if data.method == "objects_changed" and data.data["object_type"] == "event":
-            do_load = False
-            for id_event in data.data["objects"]:
-                if id_event in self.calendar.event_ids:
-                    do_load = True
-            if do_load:
-                logging.debug("Seismic message requested calendar reload")
-                self.load()
+        do_load = False
+        for id_event in data.data["objects"]:
+            if id_event in self.calendar.event_ids:
+                do_load = True
+        if do_load:
+            logging.debug("Seismic message requested calendar reload")
+            self.load()
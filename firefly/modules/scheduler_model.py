@@ -4,6 +4,7 @@ import functools
 from firefly import *
 from firefly.modules.scheduler_utils import *
 from firefly.dialogs.event import *
+from firefly.prefetch import prefetcher, schedule_assets
 
 __all__ = ["SchedulerCalendar"]
 
@@ -368,7 +369,8 @@ class SchedulerDayWidget(SchedulerVerticalBar):
                     do_reload = True
             else:
                 self.calendar.setCursor(Qt.WaitCursor)
-                response = api.schedule(
+                api.schedule(
+                        self.calendar.on_schedule_response,
                         id_channel=self.id_channel,
                         start_time=self.calendar.week_start_time,
                         end_time=self.calendar.week_end_time,
@@ -379,11 +381,6 @@ class SchedulerDayWidget(SchedulerVerticalBar):
                             }]
 
                     )
-                self.calendar.setCursor(Qt.ArrowCursor)
-                if not response:
-                    logging.error(response.message)
-
-            do_reload = True
 
 
         elif type(self.calendar.dragging) == Event:
@@ -417,24 +414,18 @@ class SchedulerDayWidget(SchedulerVerticalBar):
                         do_reload = True
                 else:
                     # Just dragging events around. Instant save
-                    self.calendar.setCursor(Qt.ArrowCursor)
-                    response = api.schedule(
+                    self.calendar.setCursor(Qt.WaitCursor)
+                    api.schedule(
+                                self.calendar.on_schedule_response,
                                 id_channel=self.id_channel,
                                 start_time=self.calendar.week_start_time,
                                 end_time=self.calendar.week_end_time,
                                 events=[event.meta]
                             )
-                    self.calendar.setCursor(Qt.ArrowCursor)
-                    if not response:
-                        logging.error(response.message)
-                    else:
-                        do_reload = response.data
 
         self.calendar.drag_source = False
         self.calendar.dragging = False
-        if type(do_reload) == list:
-            self.calendar.set_data(do_reload)
-        elif do_reload:
+        if do_reload:
             self.calendar.load()
 
 
@@ -489,21 +480,14 @@ class SchedulerDayWidget(SchedulerVerticalBar):
             QMessageBox.Yes | QMessageBox.No
             )
         if ret == QMessageBox.Yes:
-            QApplication.processEvents()
             self.calendar.setCursor(Qt.WaitCursor)
-            response = api.schedule(
+            api.schedule(
+                    self.calendar.on_schedule_response,
                     id_channel=self.id_channel,
                     start_time=self.calendar.week_start_time,
                     end_time=self.calendar.week_end_time,
                     delete=[cursor_event.id]
                 )
-            self.calendar.setCursor(Qt.ArrowCursor)
-            if response:
-                logging.info("{} deleted".format(cursor_event))
-                self.calendar.set_data(response.data)
-            else:
-                logging.error(response.message)
-                self.calendar.load()
 
 
     def wheelEvent(self, event):
@@ -593,6 +577,7 @@ class SchedulerCalendar(QWidget):
         self.drag_source = False
         self.append_condition = False
         self.selected_event = False
+        self.cancel_token = CancelToken()
 
         header_layout = QHBoxLayout()
         header_layout.addSpacing(CLOCKBAR_WIDTH + 15)
@@ -670,15 +655,30 @@ class SchedulerCalendar(QWidget):
             self.week_start_time = time.mktime(week_start.timetuple())
             self.week_end_time = self.week_start_time + SECS_PER_WEEK
 
-        QApplication.processEvents()
         self.setCursor(Qt.WaitCursor)
 
-        response = api.schedule(
+        self.cancel_token.cancel()
+        self.cancel_token = CancelToken()
+        api.schedule(
+                self.load_callback,
+                cancel_token=self.cancel_token,
                 id_channel=self.id_channel,
                 start_time=self.week_start_time,
                 end_time=self.week_end_time
             )
-
+        prefetcher.schedule("scheduler", *[
+                [
+                    "schedule",
+                    {
+                        "id_channel" : self.id_channel,
+                        "start_time" : self.week_start_time + offset,
+                        "end_time" : self.week_end_time + offset
+                    },
+                    schedule_assets
+                ] for offset in [SECS_PER_WEEK, -SECS_PER_WEEK]
+            ])
+
+    def load_callback(self, response):
         if response:
             self.clock_bar.day_start = self.day_start
             self.clock_bar.update()
@@ -694,6 +694,14 @@ class SchedulerCalendar(QWidget):
         self.setCursor(Qt.ArrowCursor)
         self.on_zoom()
 
+    def on_schedule_response(self, response):
+        self.setCursor(Qt.ArrowCursor)
+        if not response:
+            logging.error(response.message)
+            self.load()
+            return
+        self.set_data(response.data)
+
 
     def set_data(self, data):
         self.events = []
@@ -0,0 +1,101 @@
+import functools
+import collections
+
+from .common import *
+
+__all__ = ["prefetcher"]
+
+PREFETCH_DELAY = 1500   # ms of idle time after navigation
+PREFETCH_BUDGET = 2000  # assets fetched per navigation
+
+
+def rundown_assets(response):
+    return [
+            [row["id_asset"], row.get("asset_mtime", 0)]
+            for row in response.data
+            if row.get("object_type") == "item" and row.get("id_asset")
+        ]
+
+
+def schedule_assets(response):
+    return [[row["id_asset"], 0] for row in response.data if row.get("id_asset")]
+
+
+def browser_assets(response):
+    return response.data
+
+
+class Prefetcher(QObject):
+    """Warms the asset cache for views the operator is likely to open next.
+
+    Each view registers its targets (queries returning assets) under its
+    own name. Targets of the most recent navigation go first. Queries run
+    one by one in the background lane after a short idle period, and the
+    number of fetched assets is limited by PREFETCH_BUDGET.
+    """
+    def __init__(self):
+        super(Prefetcher, self).__init__()
+        self.targets = collections.OrderedDict()
+        self.budget = PREFETCH_BUDGET
+        self.cancel_token = CancelToken()
+        self.running = False
+        self.timer = None
+
+    @property
+    def enabled(self):
+        return config.get("prefetch", True)
+
+    def schedule(self, name, *targets):
+        """Replaces prefetch targets of a view.
+
+        Each target is a [method, kwargs, extractor] list. Extractor
+        returns [id, mtime] pairs of assets from the query response.
+        """
+        if not self.enabled:
+            return
+        if self.timer is None:
+            self.timer = QTimer(self)
+            self.timer.setSingleShot(True)
+            self.timer.timeout.connect(self.run_next)
+        self.targets.pop(name, None)
+        self.targets[name] = list(targets)
+        self.targets.move_to_end(name, last=False)
+        self.budget = PREFETCH_BUDGET
+        # Navigation supersedes prefetch queries in flight
+        self.cancel_token.cancel()
+        self.cancel_token = CancelToken()
+        self.running = False
+        self.timer.start(PREFETCH_DELAY)
+
+    def run_next(self):
+        if self.running:
+            return
+        while self.targets:
+            name, targets = next(iter(self.targets.items()))
+            if targets:
+                break
+            del(self.targets[name])
+        else:
+            return
+        if self.budget <= 0:
+            self.targets.clear()
+            return
+        method, kwargs, extractor = targets.pop(0)
+        self.running = True
+        api.run(
+                method,
+                functools.partial(self.on_response, extractor),
+                lane=LANE_BACKGROUND,
+                cancel_token=self.cancel_token,
+                **kwargs
+            )
+
+    def on_response(self, extractor, response):
+        self.running = False
+        if response:
+            requested = extractor(response)[:self.budget]
+            self.budget -= asset_cache.request(requested, lane=LANE_BACKGROUND)
+        self.run_next()
+
+
+prefetcher = Prefetcher()
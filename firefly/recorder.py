@@ -0,0 +1,64 @@
+import json
+import time
+import threading
+
+__all__ = ["recorder"]
+
+
+# Keys added to every query by NebulaAPI. They are not part of the
+# recorded query, so sessions can be replayed with any login.
+VOLATILE_KEYS = ["session_id", "initiator"]
+
+
+def recorded_params(params):
+    return {k : v for k, v in params.items() if k not in VOLATILE_KEYS}
+
+
+class SessionRecorder():
+    """Captures API and seismic traffic to a JSON lines file.
+
+    Recorded sessions are replayed by devtools.stub_hub.
+    """
+    def __init__(self):
+        self.file = None
+        self.lock = threading.Lock()
+        self.start_time = 0
+
+    @property
+    def active(self):
+        return self.file is not None
+
+    def open(self, path):
+        self.close()
+        self.file = open(path, "a")
+        self.start_time = time.time()
+        self.write({"type" : "start"})
+
+    def close(self):
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+
+    def write(self, data):
+        data["t"] = time.time()
+        line = json.dumps(data, ensure_ascii=False, default=str) + "\n"
+        with self.lock:
+            if self.file:
+                self.file.write(line)
+                self.file.flush()
+
+    def record_api(self, method, params, response, duration):
+        self.write({
+                "type" : "api",
+                "method" : method,
+                "params" : recorded_params(params),
+                "response" : response,
+                "duration" : duration,
+            })
+
+    def record_seismic(self, packet):
+        self.write({"type" : "seismic", "packet" : packet})
+
+
+recorder = SessionRecorder()
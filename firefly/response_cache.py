@@ -0,0 +1,111 @@
+import copy
+import json
+import hashlib
+
+from nx import *
+from pyqtbs import *
+from nebulacore import *
+
+from .recorder import recorded_params
+
+__all__ = ["response_cache", "is_conditional_query", "content_etag"]
+
+RESPONSE_CACHE_LIMIT = 200
+SAVE_DELAY = 5000 # ms. Changes made meanwhile are written at once.
+
+
+def is_conditional_query(method, kwargs):
+    """Slow-changing endpoints revalidated with If-None-Match"""
+    if method == "settings":
+        return True
+    if method == "actions":
+        # Actions of a selection are rarely asked for again and would push
+        # useful entries out of the cache
+        return not kwargs.get("objects")
+    if method == "playout":
+        return kwargs.get("action") == "plugin_list"
+    return False
+
+
+def content_etag(text):
+    return '"{}"'.format(hashlib.sha1(text.encode("utf-8")).hexdigest())
+
+
+class ResponseCache():
+    """Persistent cache of validated responses.
+
+    Each entry stores the entity tag sent by the hub (or a hash of the
+    payload if the hub does not send one) together with the response.
+    When the hub answers 304 Not Modified, the stored response is used.
+    """
+    def __init__(self):
+        self.data = {}
+        self.hits = 0
+        self.dirty = False
+        self.timer = None
+
+    @property
+    def path(self):
+        return "ffdata.{}.responses".format(config["site_name"])
+
+    def key(self, method, kwargs):
+        params = recorded_params(kwargs)
+        return method + ":" + json.dumps(params, sort_keys=True, default=str)
+
+    def etag(self, key):
+        try:
+            return self.data[key]["etag"]
+        except KeyError:
+            return None
+
+    def get(self, key):
+        """Returns a copy of the stored response, so callers cannot alter the cache"""
+        entry = self.data[key]
+        entry["atime"] = time.time()
+        self.hits += 1
+        return copy.deepcopy(entry["response"])
+
+    def store(self, key, etag, response):
+        entry = self.data.get(key)
+        if entry and entry["etag"] == etag:
+            entry["atime"] = time.time()
+            return
+        self.data[key] = {"etag" : etag, "response" : copy.deepcopy(response), "atime" : time.time()}
+        if len(self.data) > RESPONSE_CACHE_LIMIT:
+            keys = sorted(self.data, key=lambda k: self.data[k]["atime"])
+            for k in keys[:-RESPONSE_CACHE_LIMIT]:
+                del(self.data[k])
+        self.save_later()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            self.data = json.load(open(self.path))
+        except Exception:
+            log_traceback("Corrupted response cache file '{}'".format(self.path))
+            self.data = {}
+
+    def save_later(self):
+        self.dirty = True
+        if self.timer is None:
+            self.timer = QTimer()
+            self.timer.setSingleShot(True)
+            self.timer.timeout.connect(self.save)
+        if not self.timer.isActive():
+            self.timer.start(SAVE_DELAY)
+
+    def save(self):
+        if not self.dirty:
+            return
+        self.dirty = False
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(self.data, f)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            log_traceback("Unable to save response cache")
+
+
+response_cache = ResponseCache()
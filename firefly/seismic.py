@@ -0,0 +1,302 @@
+import time
+import copy
+import functools
+
+from .common import *
+
+__all__ = ["coalesce_messages", "seismic_stats", "seismic_router", "SeismicCatchUp"]
+
+# Handlers running longer than this (seconds) are reported as slow
+SLOW_HANDLER = 0.1
+
+
+def coalesce_key(message):
+    """Returns key of messages superseded by a newer one with the same key"""
+    if message.method == "playout_status":
+        return ("playout_status", message.data.get("id_channel"))
+    if message.method == "job_progress":
+        return ("job_progress", message.data.get("id"))
+    return None
+
+
+def coalesce_messages(messages):
+    """Drops redundant seismic messages.
+
+    Only the latest playout_status per channel and job_progress per job
+    are kept. objects_changed messages are merged into one per object
+    type. Messages keep the position of their first occurrence.
+    Returns the list of messages to handle.
+    """
+    result = []
+    latest = {}
+    changed = {}  # object_type: [merged message, ids in it]
+    for message in messages:
+        if message.method == "objects_changed":
+            object_type = message.data.get("object_type")
+            if object_type in changed:
+                merged, ids = changed[object_type]
+                for id_object in message.data.get("objects", []):
+                    if id_object not in ids:
+                        ids.add(id_object)
+                        merged.data["objects"].append(id_object)
+                continue
+            message = copy.copy(message)
+            message.data = dict(message.data)
+            message.data["objects"] = list(message.data.get("objects", []))
+            changed[object_type] = [message, set(message.data["objects"])]
+            result.append(message)
+            continue
+
+        key = coalesce_key(message)
+        if key is None:
+            result.append(message)
+        elif key in latest:
+            result[latest[key]] = message
+        else:
+            latest[key] = len(result)
+            result.append(message)
+    return result
+
+
+class SeismicStats():
+    """Seismic queue depth, lag and throughput"""
+    def __init__(self):
+        self.received = 0
+        self.handled = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.depth = 0
+        self.max_depth = 0
+        self.lag = 0
+        self.max_lag = 0
+        self.last_warning = 0
+
+    def update(self, depth, lag):
+        self.depth = depth
+        self.max_depth = max(self.max_depth, depth)
+        self.lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        if lag > 1 and time.time() - self.last_warning > 10:
+            self.last_warning = time.time()
+            logging.warning("Seismic messages are handled {:.01f}s late ({} queued)".format(lag, depth))
+
+    def dump(self):
+        return {
+                "received" : self.received,
+                "handled" : self.handled,
+                "coalesced" : self.coalesced,
+                "dropped" : self.dropped,
+                "depth" : self.depth,
+                "max_depth" : self.max_depth,
+                "lag" : self.lag,
+                "max_lag" : self.max_lag,
+            }
+
+
+class SeismicRoute():
+    def __init__(self, method, handler, id_channel=None, predicate=None, name=None):
+        self.method = method
+        self.handler = handler
+        self.id_channel = id_channel
+        self.predicate = predicate
+        self.name = name or getattr(handler, "__qualname__", repr(handler))
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.filtered = 0
+        self.errors = 0
+        self.total_time = 0
+        self.max_time = 0
+        self.last_warning = 0
+
+    def __call__(self, message):
+        if self.predicate and not self.predicate(message):
+            self.filtered += 1
+            return
+        start_time = time.time()
+        try:
+            self.handler(message)
+        except Exception:
+            self.errors += 1
+            log_traceback("Seismic handler {} failed".format(self.name))
+        elapsed = time.time() - start_time
+        self.count += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        if elapsed > SLOW_HANDLER and time.time() - self.last_warning > 10:
+            self.last_warning = time.time()
+            logging.warning("Seismic handler {} took {:.03f}s to handle {}".format(
+                    self.name, elapsed, self.method
+                ))
+
+    def dump(self):
+        return {
+                "name" : self.name,
+                "method" : self.method,
+                "id_channel" : self.id_channel,
+                "count" : self.count,
+                "filtered" : self.filtered,
+                "errors" : self.errors,
+                "avg_time" : self.total_time / self.count if self.count else 0,
+                "max_time" : self.max_time,
+            }
+
+
+class SeismicRouter():
+    """Delivers seismic messages to subscribed handlers.
+
+    Routes are indexed by method and channel, so a message reaches only
+    handlers subscribed to its method and either to its channel or to
+    all channels. An optional predicate filters messages further.
+    """
+    def __init__(self):
+        self.routes = {}  # method: {id_channel: [routes]}, None is any channel
+        self.unrouted = 0
+
+    def subscribe(self, method, handler, id_channel=None, predicate=None, name=None):
+        route = SeismicRoute(method, handler, id_channel=id_channel, predicate=predicate, name=name)
+        self.routes.setdefault(method, {}).setdefault(id_channel, []).append(route)
+        return route
+
+    def unsubscribe(self, route):
+        channels = self.routes.get(route.method, {})
+        routes = channels.get(route.id_channel, [])
+        if route in routes:
+            routes.remove(route)
+        if not routes:
+            channels.pop(route.id_channel, None)
+        if not channels:
+            self.routes.pop(route.method, None)
+
+    def move(self, route, id_channel):
+        """Subscribes an existing route to another channel"""
+        if route.id_channel == id_channel:
+            return
+        self.unsubscribe(route)
+        route.id_channel = id_channel
+        self.routes.setdefault(route.method, {}).setdefault(id_channel, []).append(route)
+
+    def dispatch(self, message):
+        channels = self.routes.get(message.method, {})
+        routes = channels.get(None, [])
+        if type(message.data) == dict:
+            id_channel = message.data.get("id_channel")
+            if id_channel is not None:
+                routes = routes + channels.get(id_channel, [])
+        if not routes:
+            self.unrouted += 1
+            return
+        for route in routes:
+            route(message)
+
+    def __iter__(self):
+        for channels in self.routes.values():
+            for routes in channels.values():
+                yield from routes
+
+    def slowest(self):
+        return max(self, key=lambda route: route.max_time, default=None)
+
+    def reset(self):
+        self.unrouted = 0
+        for route in self:
+            route.reset()
+
+    def dump(self):
+        return {
+                "unrouted" : self.unrouted,
+                "routes" : [route.dump() for route in self]
+            }
+
+
+class SeismicCatchUp():
+    """Revalidates data after seismic messages were lost.
+
+    Instead of reloading everything, it asks the hub what changed since
+    the last received message: cached assets are refreshed by the asset
+    cache delta query and the displayed rundown is reloaded only if its
+    events changed. The jobs view is reloaded if it is displayed.
+
+    since must be a hub time, as it is compared with object mtimes. If it
+    is not known, the asset cache sync mark is used instead.
+    """
+    def __init__(self, main_widget, since, reason):
+        self.main_widget = main_widget
+        if not since and asset_cache.db:
+            since = asset_cache.sync_mark
+        self.since = since
+        self.reason = reason
+        self.start_time = time.time()
+        self.pending = 0
+        self.queries = 0
+        self.results = []
+
+    def run(self):
+        if asset_cache.sync(callback=self.on_assets_synced, lane=LANE_BACKGROUND):
+            self.begin()
+
+        rundown = self.main_widget.rundown
+        if not self.since:
+            logging.warning("Hub time of the last change is unknown. Skipping rundown check")
+        elif rundown and self.main_widget.current_module == rundown:
+            logging.debug("Requesting events changed since {}".format(format_time(self.since)))
+            self.begin()
+            api.get(
+                    functools.partial(self.on_events, rundown),
+                    object_type="event",
+                    conds=["mtime > {}".format(int(self.since))],
+                    result=["id", "id_channel", "start"],
+                    lane=LANE_BACKGROUND
+                )
+
+        jobs = self.main_widget.jobs
+        if jobs and self.main_widget.current_module == jobs:
+            self.queries += 1
+            jobs.load()
+            self.results.append("jobs reloaded")
+
+        if not self.pending:
+            self.finish()
+
+    def begin(self):
+        self.pending += 1
+        self.queries += 1
+
+    def end(self):
+        self.pending -= 1
+        if not self.pending:
+            self.finish()
+
+    def on_assets_synced(self, count):
+        if count:
+            self.queries += 1
+            self.results.append("{} assets refreshed".format(count))
+        self.end()
+
+    def on_events(self, rundown, response):
+        if response.is_error:
+            logging.warning("Unable to check changed events: {}".format(response.message))
+        else:
+            start_time = rundown.start_time
+            end_time = start_time + 3600*24
+            for id_event, id_channel, start in response.data:
+                if id_event in rundown.view.model().event_ids or \
+                        (id_channel == rundown.id_channel and start_time <= start < end_time):
+                    self.queries += 1
+                    rundown.load()
+                    self.results.append("rundown reloaded")
+                    break
+        self.end()
+
+    def finish(self):
+        logging.info("Resynchronized after {} in {:.03f}s using {} queries{}".format(
+                self.reason,
+                time.time() - self.start_time,
+                self.queries,
+                "".join([", " + result for result in self.results])
+            ))
+
+
+seismic_stats = SeismicStats()
+seismic_router = SeismicRouter()
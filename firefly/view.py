@@ -1,9 +1,27 @@
+import weakref
+
 from .common import *
 from .widgets import *
 
 from pprint import pformat
 
-__all__ = ["FireflyViewModel", "FireflySortModel", "FireflyView", "format_header", "format_description"]
+__all__ = [
+        "FireflyViewModel",
+        "FireflySortModel",
+        "FireflyView",
+        "format_header",
+        "format_description",
+        "refresh_asset_models"
+    ]
+
+# Models displaying assets. Updated through their asset row index.
+asset_models = weakref.WeakSet()
+
+
+def refresh_asset_models(*ids):
+    for model in list(asset_models):
+        model.refresh_asset_rows(ids)
+
 
 def format_header(key):
     return meta_types[key].header()
@@ -12,11 +30,18 @@ def format_description(key):
     return meta_types[key].description()
 
 class FireflyViewModel(QAbstractTableModel):
+    displays_assets = False
+
     def __init__(self, parent):
         super(FireflyViewModel, self).__init__(parent)
         self.object_data = []
         self.header_data = []
         self.changed_objects = []
+        self.asset_rows = None
+        if self.displays_assets:
+            asset_models.add(self)
+            for signal in [self.modelReset, self.rowsInserted, self.rowsRemoved, self.layoutChanged]:
+                signal.connect(self.invalidate_asset_rows)
 
     def rowCount(self, parent):
         return len(self.object_data)
@@ -81,6 +106,48 @@ class FireflyViewModel(QAbstractTableModel):
     def refresh(self):
         pass
 
+    #
+    # Asset row index
+    #
+
+    def row_asset_id(self, obj):
+        """Returns id of the asset displayed by given object"""
+        return obj.id if obj.object_type == "asset" else None
+
+    def update_asset_row(self, row):
+        """Called when the asset displayed in given row has changed"""
+        pass
+
+    def invalidate_asset_rows(self, *args):
+        # Rebuilt on the next asset update
+        self.asset_rows = None
+
+    def rows_for_asset(self, id_asset):
+        if self.asset_rows is None:
+            self.asset_rows = {}
+            for row, obj in enumerate(self.object_data):
+                id = self.row_asset_id(obj)
+                if id:
+                    self.asset_rows.setdefault(id, []).append(row)
+        return self.asset_rows.get(id_asset, [])
+
+    def refresh_asset_rows(self, ids):
+        rows = sorted({row for id in ids for row in self.rows_for_asset(int(id))})
+        if not rows:
+            return
+        for row in rows:
+            self.update_asset_row(row)
+        # Emit one signal per contiguous range of rows
+        last_col = len(self.header_data) - 1
+        start = end = rows[0]
+        for row in rows[1:]:
+            if row == end + 1:
+                end = row
+                continue
+            self.dataChanged.emit(self.index(start, 0), self.index(end, last_col))
+            start = end = row
+        self.dataChanged.emit(self.index(start, 0), self.index(end, last_col))
+
 
 class FireflySortModel(QSortFilterProxyModel):
     def __init__(self, model):
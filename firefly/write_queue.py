@@ -0,0 +1,124 @@
+import json
+import functools
+
+from nx import *
+from pyqtbs import *
+from nebulacore import *
+
+from .api import api, NebulaFuture, is_transport_error
+
+__all__ = ["write_queue"]
+
+FLUSH_INTERVAL = 5000
+
+
+class WriteQueue(QObject):
+    """Durable queue of metadata writes made while the hub is unreachable.
+
+    Queued writes are stored next to the asset cache and survive restarts.
+    They are sent in their original order once the hub answers again.
+    """
+    changed = pyqtSignal(int)
+
+    def __init__(self):
+        super(WriteQueue, self).__init__()
+        self.items = []
+        self.flushing = False
+        self.sending = False  # a write sent directly is waiting for response
+        self.timer = None
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def path(self):
+        return "ffdata.{}.writes".format(config["site_name"])
+
+    def load(self):
+        if os.path.exists(self.path):
+            try:
+                self.items = json.load(open(self.path))
+            except Exception:
+                log_traceback("Corrupted write queue file '{}'".format(self.path))
+                self.items = []
+        if self.items:
+            logging.warning("{} changes were not saved during the last session".format(len(self.items)))
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.flush)
+        self.timer.start(FLUSH_INTERVAL)
+        self.changed.emit(len(self.items))
+        self.flush()
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(self.items, f)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            log_traceback("Unable to save write queue")
+
+    def append(self, method, kwargs, first=False):
+        item = {"method" : method, "params" : kwargs, "ctime" : time.time()}
+        if first:
+            self.items.insert(0, item)
+        else:
+            self.items.append(item)
+        self.save()
+        self.changed.emit(len(self.items))
+
+    def submit(self, method, kwargs):
+        future = NebulaFuture(method)
+        if self.items or self.sending:
+            # Keep the order of writes: never overtake queued or unfinished ones
+            self.append(method, kwargs)
+            if self.sending:
+                logging.debug("{} queued behind a write in progress".format(method))
+            else:
+                self.warn(method)
+            future.resolve(NebulaResponse(202, "Change queued"))
+            self.flush()
+        else:
+            self.sending = True
+            api.run(method, functools.partial(self.on_submit_response, future, method, dict(kwargs)), **kwargs)
+        return future
+
+    def on_submit_response(self, future, method, kwargs, response):
+        self.sending = False
+        if is_transport_error(response):
+            # Writes submitted meanwhile were queued after this one
+            self.append(method, kwargs, first=True)
+            self.warn(method)
+            response = NebulaResponse(202, "Change queued")
+        future.resolve(response)
+        self.flush()
+
+    def warn(self, method):
+        logging.warning("Hub is unreachable. {} will be saved later ({} pending)".format(
+                method, len(self.items)
+            ))
+
+    def flush(self):
+        if self.flushing or self.sending or not self.items or api.breaker.is_open:
+            return
+        self.flushing = True
+        item = self.items[0]
+        api.run(item["method"], self.on_flush_response, **dict(item["params"]))
+
+    def on_flush_response(self, response):
+        self.flushing = False
+        if is_transport_error(response):
+            return
+        item = self.items.pop(0)
+        self.save()
+        self.changed.emit(len(self.items))
+        if response:
+            logging.goodnews("Queued {} saved ({} pending)".format(item["method"], len(self.items)))
+        else:
+            # Rejected by the server. Retrying would not help.
+            logging.error("Queued {} failed: {}".format(item["method"], response.message))
+        self.flush()
+
+
+write_queue = WriteQueue()
+api.write_queue = write_queue
@@ -0,0 +1,52 @@
+import time
+import collections
+
+__all__ = ["CacheMetrics"]
+
+
+class CacheMetrics():
+    """Counters of the asset cache effectiveness"""
+    def __init__(self):
+        self.reset()
+        self.load_time = 0
+        self.save_time = 0
+
+    def reset(self):
+        self.start_time = time.time()
+        self.hits = 0          # Found in memory
+        self.db_hits = 0       # Loaded from the database
+        self.misses = 0
+        self.stale = 0         # Cached, but older than requested mtime
+        self.evictions = 0
+        self.requested = 0     # Assets requested from the server
+        self.queries = 0       # Queries used to request them
+        self.accesses = collections.Counter()
+
+    @property
+    def hit_ratio(self):
+        total = self.hits + self.db_hits + self.misses
+        return (self.hits + self.db_hits) / total if total else 0
+
+    @property
+    def avg_batch_size(self):
+        return self.requested / self.queries if self.queries else 0
+
+    def hottest(self, count=20):
+        return self.accesses.most_common(count)
+
+    def dump(self):
+        return {
+                "start_time" : self.start_time,
+                "dump_time" : time.time(),
+                "hits" : self.hits,
+                "db_hits" : self.db_hits,
+                "misses" : self.misses,
+                "hit_ratio" : self.hit_ratio,
+                "stale" : self.stale,
+                "evictions" : self.evictions,
+                "requested" : self.requested,
+                "queries" : self.queries,
+                "avg_batch_size" : self.avg_batch_size,
+                "load_time" : self.load_time,
+                "save_time" : self.save_time,
+            }
@@ -0,0 +1,143 @@
+import time
+import sqlite3
+import threading
+
+from nebulacore import *
+
+__all__ = ["CacheWriter", "open_cache_db", "CACHE_LIMIT"]
+
+CACHE_LIMIT = 10000
+CACHE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS assets (
+        id INTEGER PRIMARY KEY,
+        mtime INTEGER NOT NULL DEFAULT 0,
+        atime REAL NOT NULL DEFAULT 0,
+        meta TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_assets_mtime ON assets(mtime);
+    CREATE INDEX IF NOT EXISTS idx_assets_atime ON assets(atime);
+    CREATE TABLE IF NOT EXISTS sync_state (
+        key TEXT PRIMARY KEY,
+        value REAL NOT NULL
+    );
+"""
+
+CHECKPOINT_INTERVAL = 2
+
+
+def open_cache_db(path):
+    db = sqlite3.connect(path)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(CACHE_SCHEMA)
+    return db
+
+
+class CacheWriter(threading.Thread):
+    """Writes asset cache changes to the database on a worker thread.
+
+    Changes are collected and committed in one transaction every
+    CHECKPOINT_INTERVAL seconds. An interrupted checkpoint is rolled back
+    by SQLite, so the database always holds a consistent state.
+    """
+    def __init__(self, path):
+        super(CacheWriter, self).__init__(daemon=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.should_run = True
+        self.rows = {}        # id: [id, mtime, meta_json] waiting for checkpoint
+        self.writing = {}     # rows of the checkpoint in progress
+        self.accessed = set()
+        self.state = {}
+        self.checkpoints = 0
+        self.last_duration = 0
+
+    def put(self, rows):
+        with self.lock:
+            for row in rows:
+                self.rows[row[0]] = row
+
+    def touch(self, id):
+        with self.lock:
+            self.accessed.add(id)
+
+    def set_state(self, key, value):
+        with self.lock:
+            self.state[key] = value
+
+    def get_state(self, key):
+        with self.lock:
+            return self.state.get(key)
+
+    def pending(self, id):
+        """Returns the row of an asset not committed yet"""
+        with self.lock:
+            return self.rows.get(id) or self.writing.get(id)
+
+    def run(self):
+        db = open_cache_db(self.path)
+        while True:
+            self.wakeup.wait(CHECKPOINT_INTERVAL)
+            self.wakeup.clear()
+            self.checkpoint(db)
+            if not self.should_run:
+                break
+        db.close()
+
+    def checkpoint(self, db):
+        with self.lock:
+            self.writing, self.rows = self.rows, {}
+            accessed, self.accessed = self.accessed, set()
+            state, self.state = self.state, {}
+        if not (self.writing or accessed or state):
+            return
+        start_time = time.time()
+        try:
+            with db:
+                db.executemany(
+                        "INSERT OR REPLACE INTO assets (id, mtime, atime, meta) VALUES (?, ?, ?, ?)",
+                        [[id, mtime, start_time, payload] for id, mtime, payload in self.writing.values()]
+                    )
+                db.executemany(
+                        "UPDATE assets SET atime = ? WHERE id = ?",
+                        [[start_time, id] for id in accessed]
+                    )
+                db.executemany(
+                        "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)",
+                        list(state.items())
+                    )
+                if self.writing:
+                    db.execute(
+                            "DELETE FROM assets WHERE id NOT IN "
+                            "(SELECT id FROM assets ORDER BY atime DESC LIMIT ?)",
+                            [CACHE_LIMIT]
+                        )
+        except Exception:
+            log_traceback("Unable to write asset cache", handlers=False)
+            # Keep the changes for the next checkpoint
+            with self.lock:
+                for id, row in self.writing.items():
+                    self.rows.setdefault(id, row)
+                self.accessed |= accessed
+                for key, value in state.items():
+                    self.state.setdefault(key, value)
+                self.writing = {}
+            return
+        with self.lock:
+            written = len(self.writing)
+            self.writing = {}
+        self.checkpoints += 1
+        self.last_duration = time.time() - start_time
+        logging.debug("Asset cache checkpoint: {} assets written in {:.03f}s".format(
+                written,
+                self.last_duration
+            ), handlers=False)
+
+    def stop(self, timeout=1):
+        """Writes pending changes and stops the thread"""
+        self.should_run = False
+        self.wakeup.set()
+        self.join(timeout)
+        if self.is_alive():
+            logging.warning("Asset cache writer did not finish in time")
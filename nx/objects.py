@@ -1,12 +1,17 @@
 import os
+import sys
 import time
+import sqlite3
 import copy
 import functools
+import collections
 
 from nebulacore import *
 from nebulacore.base_objects import *
 
 from .cellformat import *
+from .cache_writer import CacheWriter, open_cache_db, CACHE_LIMIT
+from .cache_metrics import CacheMetrics
 
 __all__ = ["Asset", "Item", "Bin", "Event", "User", "asset_cache"]
 
@@ -20,97 +25,447 @@ asset_loading["title"] = "Loading..."
 asset_loading["status"] = CREATING
 
 
-CACHE_LIMIT = 10000
+# Bounds of assets kept in memory (count and total size of their JSON).
+# Evicted assets stay in the database.
+MEMORY_CACHE_LIMIT = 5000
+MEMORY_CACHE_BYTES = 32 * 1024 * 1024
+
+# Maximum number of host parameters in one SQLite statement
+SQL_CHUNK = 500
+
+# Maximum number of assets requested in one query. Chunks are sent
+# concurrently and each one is applied as soon as it arrives.
+REQUEST_CHUNK = 200
+
+
+# String values up to this length are shared between assets. These are
+# mostly enumerations, codes and short labels repeated across the cache.
+INTERN_VALUE_LENGTH = 32
+
+
+def compact_meta(meta):
+    """Returns asset metadata sharing key strings with other assets.
+
+    Each json.loads call creates its own copies of key strings, so
+    without interning every cached asset holds all its keys again.
+    """
+    result = {}
+    for key, value in meta.items():
+        if type(value) == str and len(value) <= INTERN_VALUE_LENGTH:
+            value = sys.intern(value)
+        result[sys.intern(key)] = value
+    return result
+
+
+def chunks(data, size):
+    for i in range(0, len(data), size):
+        yield data[i:i+size]
+
 
 class AssetCache(object):
+    """Assets known to the client.
+
+    Asset metadata are stored in a SQLite database keyed by asset id.
+    Rows are turned to Asset objects only when accessed and changed rows
+    are written as soon as they arrive from the server.
+    """
     def __init__(self):
-        self.data = {}
+        self.data = collections.OrderedDict() # Least recently used first
+        self.sizes = {}
+        self.size = 0
+        self.metrics = CacheMetrics()
+        self.writer = None
+        self.placeholders = {} # id: shared "Loading..." asset
+        self.subscribers = {}  # id: callbacks waiting for the asset
+        self.in_flight = {}   # id: mtime it was requested for
+        self.outdated = {}    # id: newer mtime seen while in flight (0 = forced)
+        self.background = {}  # id: future of a low priority query
+        self.absent = set()   # ids the server did not return
+        self.syncing = False
+        self.db = None
         self.api = None
         self.handler = None
 
     def __getitem__(self, key):
         key = int(key)
-        if not key in self.data:
-            logging.debug("Direct loading asset id", key)
-            self.request([[key, 0]])
-            return Asset()
-        asset = self.data[key]
-        asset["_last_access"] = time.time()
+        asset = self.lookup(key)
+        if asset is None:
+            if key not in self.in_flight and key not in self.absent:
+                logging.debug("Direct loading asset id", key)
+                self.request([[key, 0]])
+            return self.placeholder(key)
         return asset
 
     def get(self, key):
         key = int(key)
-        return self.data.get(key, Asset(meta={"title" : "Loading...", "id": key}))
+        asset = self.lookup(key)
+        if asset is None:
+            return self.placeholder(key)
+        return asset
+
+    def placeholder(self, key):
+        """Returns the shared placeholder of a missing asset"""
+        try:
+            return self.placeholders[key]
+        except KeyError:
+            pass
+        asset = Asset(meta={"title" : "Loading...", "id": key})
+        self.placeholders[key] = asset
+        return asset
+
+    def is_missing(self, key):
+        return self.lookup(int(key)) is None
+
+    def subscribe(self, key, callback):
+        """Calls callback(key) once, when the missing asset arrives"""
+        callbacks = self.subscribers.setdefault(int(key), [])
+        if callback not in callbacks:
+            callbacks.append(callback)
 
-    def request(self, requested):
+    def lookup(self, key):
+        """Returns cached asset, loading it from the database if needed"""
+        try:
+            asset = self.data[key]
+        except KeyError:
+            pass
+        else:
+            self.data.move_to_end(key)
+            if self.writer:
+                self.writer.touch(key)
+            self.metrics.hits += 1
+            self.metrics.accesses[key] += 1
+            return asset
+        if not self.db or (key in self.placeholders and key in self.in_flight):
+            # Missing and being fetched. Do not hit the database on every repaint.
+            self.metrics.misses += 1
+            return None
+        row = self.writer.pending(key)
+        if row:
+            payload = row[2]
+        else:
+            row = self.db.execute("SELECT meta FROM assets WHERE id = ?", [key]).fetchone()
+            if not row:
+                self.metrics.misses += 1
+                return None
+            payload = row[0]
+        asset = Asset(meta=compact_meta(json.loads(payload)))
+        self.store(key, asset, len(payload))
+        self.placeholders.pop(key, None)
+        self.writer.touch(key)
+        self.metrics.db_hits += 1
+        self.metrics.accesses[key] += 1
+        return asset
+
+    def store(self, key, asset, size):
+        """Adds asset to the memory cache. Size is the length of its JSON"""
+        if key in self.data:
+            self.size -= self.sizes[key]
+            self.data.move_to_end(key)
+        self.data[key] = asset
+        self.sizes[key] = size
+        self.size += size
+        while len(self.data) > 1 and (
+                len(self.data) > MEMORY_CACHE_LIMIT or self.size > MEMORY_CACHE_BYTES
+            ):
+            evicted = self.data.popitem(last=False)[0]
+            self.size -= self.sizes.pop(evicted)
+            self.metrics.evictions += 1
+
+    def mtimes(self, ids):
+        """Returns {id: mtime} of given assets present in the cache"""
+        result = {id : self.data[id]["mtime"] for id in ids if id in self.data}
+        if self.db:
+            for id in ids:
+                if id not in result:
+                    row = self.writer.pending(id)
+                    if row:
+                        result[id] = row[1]
+            ids = [id for id in ids if id not in result]
+            for chunk in chunks(ids, SQL_CHUNK):
+                result.update(self.db.execute(
+                        "SELECT id, mtime FROM assets WHERE id IN ({})".format(
+                            ",".join(["?"] * len(chunk))
+                        ),
+                        chunk
+                    ).fetchall())
+        return result
+
+    def request(self, requested, **kwargs):
+        """Requests missing and outdated assets.
+
+        requested is a list of [id, mtime] pairs. Keyword arguments
+        (such as lane) are passed to the api query. Returns the number
+        of requested assets.
+        """
+        requested = [[int(id), mtime] for id, mtime in requested]
+        cached = self.mtimes([id for id, mtime in requested])
         to_update = []
+        to_promote = set()
         for id, mtime in requested:
-            id = int(id)
-            if not id in self.data:
+            if id in self.in_flight:
+                # Already requested. If the asset changed since (or a refresh
+                # is forced with mtime 0), fetch it again once the pending
+                # query finishes.
+                if not mtime:
+                    self.outdated[id] = 0
+                elif mtime > self.in_flight[id] and self.outdated.get(id) != 0:
+                    self.outdated[id] = max(mtime, self.outdated.get(id, 0))
+                if id in self.background and not kwargs:
+                    to_promote.add(self.background[id])
+                continue
+            if not id in cached:
                 to_update.append(id)
             elif not mtime:
                 to_update.append(id)
-            elif self.data[id]["mtime"] < mtime:
+            elif (cached[id] or 0) < mtime:
                 to_update.append(id)
+                self.metrics.stale += 1
+            else:
+                continue
+            self.in_flight[id] = mtime
+        for future in to_promote:
+            # Prefetched assets are needed now
+            self.api.prioritize(future)
         if not to_update:
-            return True
+            return 0
 
         asset_count = len(to_update)
         if asset_count < 10:
             logging.info("Requesting data for asset(s) ID: {}".format(", ".join([str(k) for k in to_update])))
         else:
             logging.info("Requesting data for {} assets".format(asset_count))
-        self.api.get(self.on_response, objects=to_update)
+        self.metrics.requested += asset_count
+        for chunk in chunks(to_update, REQUEST_CHUNK):
+            self.metrics.queries += 1
+            future = self.api.get(functools.partial(self.on_response, chunk), objects=chunk, **kwargs)
+            if kwargs:
+                for id in chunk:
+                    self.background[id] = future
+        return asset_count
 
-    def on_response(self, response):
+    def on_response(self, chunk, response):
+        for id in chunk:
+            self.in_flight.pop(id, None)
+            self.background.pop(id, None)
         if response.is_error:
             logging.error(response.message)
+            self.outdated = {id : mtime for id, mtime in self.outdated.items() if id not in chunk}
+            # Let the next access try again
+            for id in chunk:
+                self.placeholders.pop(id, None)
             return False
         ids = []
+        rows = []
         for meta in response.data:
             try:
                 id_asset= int(meta["id"])
             except KeyError:
                 continue
-            self.data[id_asset] = Asset(meta=meta)
+            payload = json.dumps(meta)
+            self.store(id_asset, Asset(meta=compact_meta(meta)), len(payload))
+            self.placeholders.pop(id_asset, None)
+            self.absent.discard(id_asset)
             ids.append(id_asset)
+            rows.append([id_asset, meta.get("mtime") or 0, payload])
+        if self.writer:
+            self.writer.put(rows)
+        missing = set(chunk) - set(ids)
+        if missing:
+            # Deleted on the server or not accessible. Stop waiting for them.
+            logging.debug("{} requested assets were not returned".format(len(missing)))
+            self.absent |= missing
+            for id in missing:
+                self.placeholders.pop(id, None)
+                self.subscribers.pop(id, None)
+                self.outdated.pop(id, None)
         logging.debug("Updated {} assets in cache".format(len(ids)))
         if self.handler:
             self.handler(*ids)
+        for id in ids:
+            for callback in self.subscribers.pop(id, []):
+                try:
+                    callback(id)
+                except Exception:
+                    log_traceback()
+        outdated = [[id, self.outdated.pop(id)] for id in chunk if id in self.outdated]
+        if outdated:
+            self.request(outdated)
         return True
 
+    #
+    # Delta sync
+    #
+
+    @property
+    def sync_mark(self):
+        """Highest mtime the cache is known to be in sync with"""
+        value = self.writer.get_state("mtime")
+        if value:
+            return value
+        row = self.db.execute("SELECT value FROM sync_state WHERE key = 'mtime'").fetchone()
+        if row:
+            return row[0]
+        # First sync. Cache is as fresh as its newest asset.
+        return self.db.execute("SELECT MAX(mtime) FROM assets").fetchone()[0] or 0
+
+    @sync_mark.setter
+    def sync_mark(self, value):
+        self.writer.set_state("mtime", value)
+
+    def sync(self, callback=None, **kwargs):
+        """Re-fetches cached assets changed on the server since the last sync.
+
+        Called on startup and when the seismic connection is restored.
+        Optional callback receives the number of refreshed assets (None
+        on error). Other keyword arguments are passed to the api query.
+        Returns False if no query was sent.
+        """
+        if not self.db or self.syncing:
+            return False
+        sync_mark = self.sync_mark
+        if not sync_mark:
+            return False
+        self.syncing = True
+        logging.debug("Requesting assets changed since {}".format(format_time(sync_mark)))
+        self.api.get(
+                functools.partial(self.on_sync_response, time.time(), callback),
+                conds=["mtime > {}".format(int(sync_mark))],
+                result=["id", "mtime"],
+                **kwargs
+            )
+        return True
+
+    def on_sync_response(self, start_time, callback, response):
+        self.syncing = False
+        if response.is_error:
+            logging.warning("Unable to sync asset cache: {}".format(response.message))
+            if callback:
+                callback(None)
+            return
+        changed = {int(id) : mtime for id, mtime in response.data}
+        cached = self.mtimes(list(changed))
+        stale = [[id, changed[id]] for id in cached if (cached[id] or 0) < changed[id]]
+        if changed:
+            self.sync_mark = max(changed.values())
+        logging.info("{} assets changed since the last sync. Refreshing {} cached ({:.03f}s)".format(
+                len(changed),
+                len(stale),
+                time.time() - start_time
+            ))
+        if stale:
+            self.request(stale)
+        if callback:
+            callback(len(stale))
+
+    #
+    # Persistence
+    #
 
     @property
     def cache_path(self):
         return "ffdata.{}.cache".format(config["site_name"])
 
+    @property
+    def db_path(self):
+        return "ffdata.{}.db".format(config["site_name"])
+
     def load(self):
-        if not os.path.exists(self.cache_path):
-            return
+        start_time = time.time()
+        try:
+            self.db = open_cache_db(self.db_path)
+        except sqlite3.DatabaseError:
+            log_traceback("Corrupted cache database '{}'. Creating a new one".format(self.db_path))
+            for suffix in ["", "-wal", "-shm"]:
+                if os.path.exists(self.db_path + suffix):
+                    os.remove(self.db_path + suffix)
+            self.db = open_cache_db(self.db_path)
+        if os.path.exists(self.cache_path):
+            self.migrate()
+        # Changes are written by a worker thread. This connection only reads.
+        self.writer = CacheWriter(self.db_path)
+        self.writer.start()
+        self.metrics.load_time = time.time() - start_time
+
+    def migrate(self):
+        """Imports the JSON cache file used by previous versions"""
         start_time = time.time()
         try:
             data = json.load(open(self.cache_path))
-        except:
+        except Exception:
             log_traceback("Corrupted cache file '{}'".format(self.cache_path))
+            data = []
+        now = time.time()
+        with self.db:
+            self.db.executemany(
+                    "INSERT OR IGNORE INTO assets (id, mtime, atime, meta) VALUES (?, ?, ?, ?)",
+                    [
+                        [
+                            int(meta["id"]),
+                            meta.get("mtime", 0),
+                            meta.pop("_last_access", now),
+                            json.dumps(meta)
+                        ] for meta in data if "id" in meta
+                    ]
+                )
+        os.remove(self.cache_path)
+        logging.info("Migrated {} assets to the new cache format in {:.03f}s".format(
+                len(data),
+                time.time() - start_time
+            ))
+
+    def save(self):
+        """Commits pending changes. Called on exit"""
+        if not self.db:
             return
+        start_time = time.time()
+        self.writer.stop()
+        self.db.close()
+        self.db = None
+        self.metrics.save_time = time.time() - start_time
+        logging.debug("Cache updated in {:.03f}s".format(self.metrics.save_time))
 
-        for meta in data:
-            self.data[int(meta["id"])] = Asset(meta=meta)
-        logging.debug("Loaded {} assets from cache in {:.03f}s".format(len(self.data), time.time() - start_time))
+    #
+    # Statistics
+    #
 
-    def save(self):
-        if len(self.data) > CACHE_LIMIT:
-            to_rm = list(self.data.keys())
-            to_rm.sort(key=lambda x: self.data[x].meta.get("_last_access", 0))
-            for t in to_rm[:-CACHE_LIMIT]:
-                del(self.data[t])
+    def stats(self):
+        result = self.metrics.dump()
+        result.update({
+                "memory_count" : len(self.data),
+                "memory_bytes" : self.size,
+                "memory_limit" : MEMORY_CACHE_LIMIT,
+                "memory_bytes_limit" : MEMORY_CACHE_BYTES,
+                "placeholders" : len(self.placeholders),
+                "in_flight" : len(self.in_flight),
+            })
+        if self.db:
+            count, size = self.db.execute("SELECT COUNT(*), SUM(LENGTH(meta)) FROM assets").fetchone()
+            result.update({
+                    "db_count" : count,
+                    "db_bytes" : size or 0,
+                    "db_limit" : CACHE_LIMIT,
+                    "checkpoints" : self.writer.checkpoints,
+                    "checkpoint_time" : self.writer.last_duration,
+                })
+        return result
 
-        logging.info("Saving {} assets to local cache".format(len(self.data)))
-        start_time = time.time()
-        data = [asset.meta for asset in self.data.values()]
-        with open(self.cache_path, "w") as f:
-            json.dump(data, f)
-        logging.debug("Cache updated in {:.03f}s".format(time.time() - start_time))
+    def peek(self, key):
+        """Returns cached asset without recording the access"""
+        if key in self.data:
+            return self.data[key]
+        if not self.db:
+            return None
+        row = self.db.execute("SELECT meta FROM assets WHERE id = ?", [key]).fetchone()
+        return Asset(meta=json.loads(row[0])) if row else None
+
+    def largest(self, count=20):
+        """Returns [id, size] of the largest cached assets"""
+        if not self.db:
+            return sorted(self.sizes.items(), key=lambda x: x[1], reverse=True)[:count]
+        return self.db.execute(
+                "SELECT id, LENGTH(meta) AS size FROM assets ORDER BY size DESC LIMIT ?",
+                [count]
+            ).fetchall()
 
 asset_cache = AssetCache()
 
@@ -0,0 +1,60 @@
+import pytest
+
+pytest.importorskip("pyqtbs")
+pytest.importorskip("nebulacore")
+
+from firefly.listener import SeismicMessage
+from firefly.seismic import SeismicRouter
+
+
+def message(method, data):
+    return SeismicMessage([0, "test", "test", method, data])
+
+
+def test_channel_only_subscription():
+    router = SeismicRouter()
+    received = []
+    router.subscribe("playout_status", received.append, id_channel=1)
+
+    router.dispatch(message("playout_status", {"id_channel" : 1}))
+    router.dispatch(message("playout_status", {"id_channel" : 2}))
+
+    assert [m.data["id_channel"] for m in received] == [1]
+    assert router.unrouted == 1
+
+
+def test_channel_and_catch_all_routes():
+    router = SeismicRouter()
+    received = []
+    router.subscribe("playout_status", lambda m: received.append("any"))
+    route = router.subscribe("playout_status", lambda m: received.append("channel"), id_channel=1)
+
+    router.dispatch(message("playout_status", {"id_channel" : 1}))
+    assert received == ["any", "channel"]
+
+    router.move(route, 2)
+    received.clear()
+    router.dispatch(message("playout_status", {"id_channel" : 1}))
+    router.dispatch(message("playout_status", {"id_channel" : 2}))
+    assert received == ["any", "any", "channel"]
+
+
+def test_unsubscribed_method_is_unrouted():
+    router = SeismicRouter()
+    router.dispatch(message("job_progress", {"id" : 1}))
+    assert router.unrouted == 1
+
+
+def test_predicate_filters_messages():
+    router = SeismicRouter()
+    received = []
+    route = router.subscribe(
+            "objects_changed",
+            received.append,
+            predicate=lambda m: m.data["object_type"] == "asset"
+        )
+    router.dispatch(message("objects_changed", {"object_type" : "event", "objects" : [1]}))
+    router.dispatch(message("objects_changed", {"object_type" : "asset", "objects" : [1]}))
+    assert len(received) == 1
+    assert route.count == 1
+    assert route.filtered == 1